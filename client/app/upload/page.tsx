@@ -6,6 +6,15 @@ import { useRouter } from "next/navigation";
 import Image from "next/image";
 import { json } from "stream/consumers";
 
+const API_URL = "http://localhost:5000";
+
+interface PlayerStats {
+  kills: number;
+  deaths: number;
+  assists: number;
+  team_color: string;
+}
+
 interface Video {
   id: string;
   title: string;
@@ -22,6 +31,10 @@ const UploadPage = () => {
     "idle" | "uploading" | "success" | "error"
   >("idle");
   const [isProcessing, setIsProcessing] = useState(false);
+  const [processingProgress, setProcessingProgress] = useState(0);
+  const [liveScoreboard, setLiveScoreboard] = useState<
+    Record<string, PlayerStats>
+  >({});
 
   const previousHighlights = [
     {
@@ -62,38 +75,68 @@ const UploadPage = () => {
     }
   };
 
+  const waitForJob = (jobId: string): Promise<any> =>
+    // follow the job's progress and partial scoreboard until it has finished
+    new Promise((resolve, reject) => {
+      const events = new EventSource(`${API_URL}/jobs/${jobId}/events`);
+
+      events.addEventListener("progress", (e) => {
+        const status = JSON.parse((e as MessageEvent).data);
+        setProcessingProgress(status.percent);
+        if (status.scoreboard) setLiveScoreboard(status.scoreboard);
+      });
+      events.addEventListener("done", (e) => {
+        events.close();
+        resolve(JSON.parse((e as MessageEvent).data).result);
+      });
+      events.addEventListener("error", (e) => {
+        events.close();
+        const data = (e as MessageEvent).data;
+        reject(new Error(data ? JSON.parse(data).error : "Processing failed"));
+      });
+    });
+
   const handleUpload = async (file: File) => {
     const formData = new FormData();
     formData.append("video", file);
 
     setIsProcessing(true);
+    setProcessingProgress(0);
+    setLiveScoreboard({});
     try {
-      const response = await fetch("http://localhost:5000/upload", {
+      const response = await fetch(`${API_URL}/upload`, {
         method: "POST",
         body: formData,
       });
 
-      if (response.ok) {
-        setUploadStatus("success");
-      } else {
+      if (!response.ok) {
         setUploadStatus("error");
-        console.error("Failed to upload file");
+        console.error(
+          response.status === 429
+            ? "Server is busy, try again later"
+            : "Failed to upload file"
+        );
+        return;
       }
 
-      const result = await response.json();
+      setUploadStatus("success");
+
+      const { job_id } = await response.json();
+      const result = await waitForJob(job_id);
       console.log(result);
 
       // store scoreboard in localstorage
       localStorage.setItem("scoreboard", JSON.stringify(result.scoreboard));
+      localStorage.setItem("weaponStats", JSON.stringify(result.weapon_stats));
+
+      // redirect to /scoreboard
+      router.push("/scoreboard");
     } catch (error) {
       setUploadStatus("error");
       console.error("Error uploading file:", error);
     } finally {
-      setIsProcessing(false); // Simulate processing delay
+      setIsProcessing(false);
     }
-
-    // redirect to /scoreboard
-    router.push("/scoreboard");
   };
 
   const handleHighlightClick = (video: Video) => {
@@ -205,9 +248,40 @@ const UploadPage = () => {
               </h3>
 
               <div className="h-2 bg-gray-700 rounded-full overflow-hidden mb-4">
-                <div className="h-full bg-gradient-to-r from-blue-500 to-teal-500 animate-loading" />
+                <div
+                  className="h-full bg-gradient-to-r from-blue-500 to-teal-500 transition-all duration-300"
+                  style={{ width: `${processingProgress}%` }}
+                />
               </div>
 
+              <p className="text-center text-sm text-gray-400 mb-2">
+                {processingProgress.toFixed(0)}% of frames analysed
+              </p>
+
+              {Object.keys(liveScoreboard).length > 0 && (
+                <ul className="mb-4 space-y-1 text-sm">
+                  {Object.entries(liveScoreboard)
+                    .sort(([, a], [, b]) => b.kills - a.kills)
+                    .slice(0, 5)
+                    .map(([player, stats]) => (
+                      <li key={player} className="flex justify-between">
+                        <span
+                          className={
+                            stats.team_color === "green"
+                              ? "text-[#1fed33]"
+                              : "text-red-500"
+                          }
+                        >
+                          {player.split("_").slice(1).join("_")}
+                        </span>
+                        <span className="text-gray-300">
+                          {stats.kills} / {stats.deaths} / {stats.assists}
+                        </span>
+                      </li>
+                    ))}
+                </ul>
+              )}
+
               <div className="text-center text-gray-400 space-y-2">
                 <p className="animate-typing overflow-hidden whitespace-nowrap">
                   It will take a while, check out highlights below
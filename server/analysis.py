@@ -0,0 +1,176 @@
+import os
+from dataclasses import asdict
+
+from checkpoint import Checkpoint
+from config import Config
+from debug_artifacts import DebugArtifacts
+from frame_source import FrameSource
+from highlight import get_highlights, highlight_reels
+from killlfeed import (
+    CHANGE_DETECTION_VERSION,
+    KillEvent,
+    KillFeedConsumer,
+    ScoreboardAggregator,
+)
+from metrics import JobMetrics
+from model_registry import get_model
+from result_cache import result_key
+from weapon_tracker import WeaponHudConsumer, load_model
+
+# Result fields that belong to the job that computed it rather than the video
+JOB_FIELDS = ("metrics", "highlights")
+
+
+def analyze_match(
+    video_path,
+    job_id,
+    metrics=None,
+    video_hash=None,
+    highlight_dir=None,  # defaults to HIGHLIGHT_FOLDER/<job_id>
+    progress=None,  # progress(frame_index, frame_count) as the video is decoded
+    scoreboard=None,  # ScoreboardAggregator that gets kill events as they are found
+    event_store=None,  # EventStore the match is added to
+    result_cache=None,  # ResultCache the result is put in, keyed by video_hash
+    checkpoint_path=None,  # Resume from and periodically save progress to this file
+):
+    """Analyze a match video and return the result the API serves for it."""
+    metrics = metrics or JobMetrics(job_id, enabled=False)
+    debug = DebugArtifacts(job_id)
+    scoreboard = scoreboard or ScoreboardAggregator()
+    if highlight_dir is None:
+        highlight_dir = os.path.join(Config.HIGHLIGHT_FOLDER, job_id)
+
+    # Decode the video once and feed every analyzer from the same frames
+    killfeed = KillFeedConsumer(
+        get_model(Config.KILL_FEED_MODEL_PATH),
+        fps_target=Config.KILL_FEED_FPS_TARGET,
+        track_timeout=Config.KILL_FEED_TRACK_TIMEOUT,
+        max_latency=Config.KILL_FEED_MAX_LATENCY,
+        debug=debug,
+        metrics=metrics,
+    )
+    killfeed.add_listener(scoreboard.add)
+    weapons = WeaponHudConsumer(load_model(), debug=debug, metrics=metrics)
+
+    checkpoint = None
+    if checkpoint_path:
+        settings = dict(
+            killfeed_model=Config.KILL_FEED_MODEL_PATH,
+            weapon_model=Config.WEAPON_MODEL_PATH,
+            fps_target=Config.KILL_FEED_FPS_TARGET,
+            track_timeout=Config.KILL_FEED_TRACK_TIMEOUT,
+            max_latency=Config.KILL_FEED_MAX_LATENCY,
+            **change_detection_settings(),
+            weapon_cache_size=Config.WEAPON_CACHE_SIZE,
+        )
+        checkpoint = Checkpoint(checkpoint_path, video_path, settings)
+
+    FrameSource(video_path, metrics=metrics).run(
+        [killfeed, weapons], progress=progress, checkpoint=checkpoint
+    )
+
+    # the scoreboard was built as the kill events came in
+    scoreboard = scoreboard.snapshot()
+    print(scoreboard)
+
+    # the highlight reels of every player are cut from the events of the pass,
+    # by stream copy, so the video is not decoded again
+    highlights = get_highlights(
+        video_path, killfeed.events, highlight_dir, metrics=metrics
+    )
+    created = sum(reel["path"] is not None for reel in highlights.values())
+    print(f"{created} of {len(highlights)} highlight videos created in {highlight_dir}")
+
+    print(
+        f"Kill feed: {killfeed.frames_inferred} crops inferred, "
+        f"{killfeed.frames_skipped} reused, "
+        f"{killfeed.fixed_rate_samples} samples at a fixed rate"
+    )
+
+    weapon_stats = weapons.get_statistics()
+    print(weapon_stats)
+
+    result = {
+        "scoreboard": scoreboard,
+        "weapon_stats": weapon_stats,
+        "kill_events": [asdict(event) for event in killfeed.events],
+        "highlights": highlights,
+        "killfeed_stats": {
+            "frames_inferred": killfeed.frames_inferred,
+            "frames_skipped": killfeed.frames_skipped,
+            "fixed_rate_samples": killfeed.fixed_rate_samples,
+        },
+    }
+
+    # a re-uploaded video replaces its earlier events instead of counting twice
+    if event_store is not None:
+        with metrics.stage("event_store"):
+            event_store.add_match(
+                video_hash or job_id, killfeed.events, weapon_stats, video_hash
+            )
+
+    result["metrics"] = metrics.summary()
+    key = cache_key(video_hash) if video_hash and result_cache is not None else None
+    if key:
+        # another job reusing the result gets its own, see reuse_result
+        cached = {k: v for k, v in result.items() if k not in JOB_FIELDS}
+        result_cache.put(key, cached)
+
+    return result
+
+
+def reuse_result(cached, video_path, job_id, metrics=None, highlight_dir=None):
+    """
+    Complete a result from the cache with the JOB_FIELDS of the job reusing it.
+
+    Highlight reels already in `highlight_dir` are reused and only the missing
+    ones are cut from the cached kill events, see reels_missing. The metrics
+    are those of the new job.
+    """
+    metrics = metrics or JobMetrics(job_id, enabled=False)
+    if highlight_dir is None:
+        highlight_dir = os.path.join(Config.HIGHLIGHT_FOLDER, job_id)
+
+    result = dict(cached)
+    result["highlights"] = get_highlights(
+        video_path, cached_events(cached), highlight_dir, metrics=metrics, reuse=True
+    )
+    result["metrics"] = metrics.summary()
+    return result
+
+
+def reels_missing(cached, highlight_dir):
+    """True if reuse_result would have to cut a reel of `cached` into the dir."""
+    reels = highlight_reels(cached_events(cached), highlight_dir)
+    return any(not os.path.exists(reel["path"]) for reel in reels.values())
+
+
+def cached_events(cached):
+    """The KillEvents of a cached result."""
+    return [KillEvent(**event) for event in cached["kill_events"]]
+
+
+def cache_key(video_hash):
+    """Result cache key for `video_hash`, or None if a model file is missing."""
+    try:
+        return result_key(
+            video_hash,
+            fps_target=Config.KILL_FEED_FPS_TARGET,
+            track_timeout=Config.KILL_FEED_TRACK_TIMEOUT,
+            max_latency=Config.KILL_FEED_MAX_LATENCY,
+            **change_detection_settings(),
+            # lookalike weapon HUD crops reuse earlier classifications
+            weapon_cache_size=Config.WEAPON_CACHE_SIZE,
+        )
+    except FileNotFoundError:
+        return None
+
+
+def change_detection_settings():
+    """The settings deciding which kill feed crops skip inference."""
+    return dict(
+        change_threshold=Config.KILL_FEED_CHANGE_THRESHOLD,
+        max_skip=Config.KILL_FEED_MAX_SKIP,
+        quiet_period=Config.KILL_FEED_QUIET_PERIOD,
+        change_detection_version=CHANGE_DETECTION_VERSION,
+    )
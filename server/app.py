@@ -1,11 +1,18 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-from killlfeed import get_scoreboard, get_kill_events
-from highlight import get_highlight
-from weapon_tracker import analyze_video
+from killlfeed import ScoreboardAggregator
+from analysis import analyze_match, cache_key, reels_missing, reuse_result
 from config import Config
-
+from model_registry import registry
+from jobs import JobQueue, QueueFullError
+from result_cache import ResultCache, save_upload
+from event_store import EventStore
+from metrics import metrics_registry
+
+import functools
+import json
 import os
+import time
 
 
 app = Flask(__name__)
@@ -17,6 +24,13 @@ CORS(app)
 if not os.path.exists(Config.UPLOAD_FOLDER):
     os.makedirs(Config.UPLOAD_FOLDER)
 
+if not os.path.exists(Config.CHECKPOINT_FOLDER):
+    os.makedirs(Config.CHECKPOINT_FOLDER)
+
+
+# Load and warm up the models once, before the first upload arrives
+registry.preload([Config.KILL_FEED_MODEL_PATH, Config.WEAPON_MODEL_PATH])
+
 
 @app.route("/upload", methods=["POST"])
 def upload_video():
@@ -28,42 +42,190 @@ def upload_video():
     if file.filename == "":
         return jsonify({"error": "No selected file"}), 400
 
-    # Save the file to the uploads folder
-    file_path = os.path.join(Config.UPLOAD_FOLDER, file.filename)
-    file.save(file_path)
-
-    # run the model on the video
-    scoreboard = run(file.filename)
+    # Save the file to the uploads folder under its content hash
+    extension = os.path.splitext(file.filename)[1]
+    file_path, video_hash, created = save_upload(
+        file.stream, Config.UPLOAD_FOLDER, extension
+    )
 
-    # weapon tracker
+    # answer re-uploads of an already analysed video from the cache
+    key = cache_key(video_hash)
+    cached = result_cache.get(key) if key else None
+    target = None
+    if cached is not None:
+        highlight_dir = highlight_folder(key)
+
+        def reuse(job, metrics):
+            return reuse_result(cached, job.video_path, job.id, metrics, highlight_dir)
+
+        target = functools.partial(run, work=reuse)
+        if not reels_missing(cached, highlight_dir):
+            job = job_queue.run(file_path, target, video_hash=video_hash)
+            return jsonify({"job_id": job.id, "cached": True}), 200
+
+    # queue the analysis, or the cutting of the reels a cached result is
+    # missing, and return straight away; an upload of a video that is already
+    # being analysed gets that job
+    try:
+        job = job_queue.submit(file_path, video_hash=video_hash, target=target)
+    except QueueFullError:
+        if created:
+            os.remove(file_path)
+        return jsonify({"error": "Too many videos queued, try again later"}), 429
+
+    if cached is not None:
+        return jsonify({"job_id": job.id, "cached": True}), 202
+    return jsonify({"job_id": job.id}), 202
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    return jsonify(job.status())
+
+
+@app.route("/jobs/<job_id>/result", methods=["GET"])
+def job_result(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    if job.state == "failed":
+        return jsonify({"error": job.error}), 500
+
+    if job.state != "done":
+        return jsonify({"error": "Job not finished", **job.status()}), 409
+
+    return jsonify(job.result)
+
+
+@app.route("/jobs/<job_id>/events", methods=["GET"])
+def job_events(job_id):
+    """
+    Stream a job's progress as server-sent events.
+
+    A "progress" event with the job status and the scoreboard so far is sent
+    whenever a kill is found, and at least every JOB_EVENTS_INTERVAL seconds.
+    The stream ends with a "done" event carrying the result, or an "error".
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    def message(event, data):
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    def stream():
+        events_seen = -1
+        while True:
+            if job.state == "done":
+                yield message("done", {**job.status(), "result": job.result})
+                return
+            if job.state == "failed":
+                yield message("error", job.status())
+                return
+
+            scoreboard = job.live_scoreboard
+            if scoreboard is None:  # still queued
+                yield message("progress", job.status())
+                time.sleep(Config.JOB_EVENTS_INTERVAL)
+                continue
+
+            events_seen = scoreboard.wait(events_seen, Config.JOB_EVENTS_INTERVAL)
+            yield message(
+                "progress", {**job.status(), "scoreboard": scoreboard.snapshot()}
+            )
+
+    return Response(
+        stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-    return jsonify({"scoreboard": scoreboard})
 
+@app.route("/stats/kills", methods=["GET"])
+def stored_kill_stats():
+    """
+    Kill stats across stored matches, filtered by the killer, weapon, killer_team
+    and victim query parameters; `last` limits them to the most recent matches.
+    """
+    stats = event_store.kill_stats(
+        killer=request.args.get("killer"),
+        weapon=request.args.get("weapon"),
+        killer_team=request.args.get("killer_team"),
+        victim=request.args.get("victim"),
+        last_matches=request.args.get("last", type=int),
+    )
+    return jsonify(stats)
 
-def run(filename):
-    video_path = os.path.join(Config.UPLOAD_FOLDER, filename)
 
-    kill_events = get_kill_events(
-        video_path=video_path,
-        model_path=Config.KILL_FEED_MODEL_PATH,
-        fps_target=5,
-        deduplication_window=5.1,
+@app.route("/stats/weapons", methods=["GET"])
+def stored_weapon_usage():
+    """Seconds each weapon was held across stored matches."""
+    usage = event_store.weapon_usage(
+        weapon=request.args.get("weapon"),
+        last_matches=request.args.get("last", type=int),
     )
-    # get scoreboard
-    scoreboard = get_scoreboard(kill_events)
-
-    # get highlight
-    highlight_err = get_highlight(
-        csv_path=Config.CSV_LOG_PATH,
-        video_path=video_path,
-        agent_name="Kayo",
+    return jsonify(usage)
+
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    """Stage timings and counts of every job, in Prometheus text format."""
+    return Response(metrics_registry.render(), mimetype="text/plain; version=0.0.4")
+
+
+def run(job, work=None):
+    """Run `work(job, metrics)`, by default analyze, recording the job's metrics."""
+    metrics = metrics_registry.start(job.id)
+    try:
+        result = (work or analyze)(job, metrics)
+    except Exception:
+        metrics_registry.finish(metrics, "failed")
+        raise
+
+    metrics_registry.finish(metrics)
+    return result
+
+
+def analyze(job, metrics):
+    job.live_scoreboard = ScoreboardAggregator()
+
+    # uploads keep their file, so re-uploading a video whose job died with the
+    # server carries on from its last checkpoint; JobQueue.submit runs one job
+    # per video at a time, so no two jobs share it
+    checkpoint_path = None
+    if job.video_hash:
+        checkpoint_path = os.path.join(
+            Config.CHECKPOINT_FOLDER, f"{job.video_hash}.ckpt"
+        )
+
+    key = cache_key(job.video_hash) if job.video_hash else None
+    return analyze_match(
+        job.video_path,
+        job.id,
+        metrics,
+        video_hash=job.video_hash,
+        highlight_dir=highlight_folder(key or job.id),
+        progress=job.update_progress,
+        scoreboard=job.live_scoreboard,
+        event_store=event_store,
+        result_cache=result_cache,
+        checkpoint_path=checkpoint_path,
     )
-    print(highlight_err)
 
-    weapon_stats = analyze_video(video_path)
-    print(weapon_stats)
 
-    return scoreboard
+def highlight_folder(name):
+    # reels of a cached result are kept under its key, so re-uploads reuse them
+    return os.path.join(Config.HIGHLIGHT_FOLDER, name)
+
+
+job_queue = JobQueue(run)
+result_cache = ResultCache()
+event_store = EventStore()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,258 @@
+"""
+Analyze every video of a directory or manifest, spread over the CPU cores.
+
+Usage (from the server directory):
+    python batch.py SOURCE [--output DIR] [--workers N] [--force]
+
+SOURCE is a directory, whose video files are analyzed, or a manifest: a text
+file with one video path per line, relative to the manifest, where blank lines
+and lines starting with # are ignored.
+
+Each video gets `<name>.json` with the result the API serves for it, a
+`<name>.log` of its output and its highlight reels in `<name>/`, all in the
+output directory. Videos that already have a result there are skipped unless
+--force is given, and results computed before by the server are reused from
+the result cache. While a video is analyzed its progress is saved to
+`<name>.ckpt`, so a batch that was stopped carries on where each video had
+got to. The longest videos start first, which keeps the last worker
+from finishing long after the others. A summary table is printed and written to
+summary.csv.
+"""
+
+import argparse
+import contextlib
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from analysis import analyze_match, cache_key, reuse_result
+from config import Config
+from event_store import EventStore
+from frame_source import FrameSource
+from metrics import JobMetrics
+from result_cache import ResultCache, file_digest
+from segments import limit_threads
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv")
+
+SUMMARY_FIELDS = ["video", "status", "duration", "seconds", "fps", "speed", "kills"]
+
+# Per worker process, made by _init_worker
+_result_cache = None
+_event_store = None
+
+
+def collect_videos(source):
+    """Paths of the videos of a directory or manifest, in the order given."""
+    if os.path.isdir(source):
+        return [
+            os.path.join(source, name)
+            for name in sorted(os.listdir(source))
+            if name.lower().endswith(VIDEO_EXTENSIONS)
+        ]
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source) as f:
+        lines = [line.strip() for line in f]
+    return [
+        os.path.join(base, line) for line in lines if line and not line.startswith("#")
+    ]
+
+
+def video_name(video_path):
+    return os.path.splitext(os.path.basename(video_path))[0]
+
+
+def _init_worker(threads):
+    global _result_cache, _event_store
+
+    limit_threads(threads)
+    _result_cache = ResultCache()
+    _event_store = EventStore()
+
+
+def analyze_one(video_path, output_dir):
+    """Analyze a video into the output directory and return its summary row."""
+    name = video_name(video_path)
+    start = time.perf_counter()
+    row = dict.fromkeys(SUMMARY_FIELDS)
+    row.update(video=name, status="done")
+
+    with open(os.path.join(output_dir, f"{name}.log"), "w") as log:
+        with contextlib.redirect_stdout(log):
+            try:
+                video_hash = file_digest(video_path)
+                key = cache_key(video_hash)
+                result = _result_cache.get(key) if key else None
+                highlight_dir = os.path.join(output_dir, name)
+                if result is not None:
+                    row["status"] = "cached"
+                    result = reuse_result(
+                        result,
+                        video_path,
+                        name,
+                        JobMetrics(name),
+                        highlight_dir=highlight_dir,
+                    )
+                else:
+                    result = analyze_match(
+                        video_path,
+                        name,
+                        JobMetrics(name),
+                        video_hash=video_hash,
+                        highlight_dir=highlight_dir,
+                        event_store=_event_store,
+                        result_cache=_result_cache,
+                        checkpoint_path=os.path.join(output_dir, f"{name}.ckpt"),
+                    )
+
+                # Written whole or not at all, as its existence skips the video
+                path = os.path.join(output_dir, f"{name}.json")
+                with open(path + ".part", "w") as f:
+                    json.dump(result, f)
+                os.replace(path + ".part", path)
+                row["kills"] = len(result["kill_events"])
+            except Exception:
+                traceback.print_exc(file=log)
+                row["status"] = "failed"
+
+    row["seconds"] = time.perf_counter() - start
+    return row
+
+
+def print_summary(rows, frame_counts, wall_seconds):
+    print(
+        f"\n{'video':30s} {'status':8s} {'duration':>9s} {'seconds':>9s}"
+        f" {'fps':>8s} {'speed':>7s} {'kills':>6s}"
+    )
+
+    def cell(value, spec, width):
+        return f"{'' if value is None else format(value, spec):>{width}s}"
+
+    for row in rows:
+        speed = None if row["speed"] is None else f"{row['speed']:.2f}x"
+        print(
+            f"{row['video'][:30]:30s} {row['status']:8s}"
+            f" {cell(row['duration'], '.1f', 9)} {cell(row['seconds'], '.1f', 9)}"
+            f" {cell(row['fps'], '.1f', 8)} {cell(speed, 's', 7)}"
+            f" {cell(row['kills'], 'd', 6)}"
+        )
+
+    counts = {status: 0 for status in ("done", "cached", "skipped", "failed")}
+    for row in rows:
+        counts[row["status"]] += 1
+    analyzed = [row for row in rows if row["status"] == "done"]
+    video_seconds = sum(row["duration"] for row in analyzed)
+    frames = sum(frame_counts[row["video"]] for row in analyzed)
+    wall_seconds = max(wall_seconds, 1e-9)
+    print(
+        "\n" + ", ".join(f"{n} {status}" for status, n in counts.items()),
+        f"in {wall_seconds:.1f}s: {video_seconds / 60:.1f} min of video analyzed "
+        f"at {frames / wall_seconds:.1f} fps, "
+        f"{video_seconds / wall_seconds:.2f}x real time",
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("source")
+    parser.add_argument("--output", default=Config.BATCH_OUTPUT_FOLDER)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Videos analyzed at once; by default one per BATCH_THREADS cores",
+    )
+    parser.add_argument("--force", action="store_true", help="Redo existing results")
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    videos = collect_videos(args.source)
+    names = [video_name(path) for path in videos]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        sys.exit(f"Videos share an output name: {', '.join(duplicates)}")
+
+    rows, todo, frame_counts = [], [], {}
+    for path in videos:
+        info = FrameSource(path).probe()
+        row = dict.fromkeys(SUMMARY_FIELDS)
+        row.update(video=video_name(path), duration=info.duration)
+        frame_counts[row["video"]] = info.frame_count
+
+        if info.fps <= 0:
+            print(f"Could not open video: {path}")
+            rows.append({**row, "status": "failed"})
+        elif not args.force and os.path.exists(
+            os.path.join(args.output, f"{row['video']}.json")
+        ):
+            rows.append({**row, "status": "skipped"})
+        else:
+            todo.append((info.duration, path))
+
+    # Longest first, so no long video is left to run alone at the end
+    todo.sort(reverse=True)
+    cores = multiprocessing.cpu_count() or 1
+    workers = args.workers or max(1, cores // Config.BATCH_THREADS)
+    workers = max(1, min(workers, len(todo)))
+    threads = max(1, cores // workers)
+    print(
+        f"{len(videos)} videos, {len(todo)} to analyze with {workers} workers "
+        f"of {threads} threads"
+    )
+
+    start = time.perf_counter()
+    durations = {video_name(path): duration for duration, path in todo}
+
+    def finished(row):
+        row["duration"] = durations[row["video"]]
+        if row["status"] == "done":
+            row["fps"] = frame_counts[row["video"]] / row["seconds"]
+            row["speed"] = row["duration"] / row["seconds"]
+        rows.append(row)
+        print(
+            f"[{len(rows)}/{len(videos)}] {row['video']} {row['status']} "
+            f"in {row['seconds']:.1f}s"
+        )
+
+    if workers == 1:
+        _init_worker(threads)
+        for _, path in todo:
+            finished(analyze_one(path, args.output))
+    elif todo:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            # Workers must not inherit the parent's torch and OpenCV thread pools
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(threads,),
+        ) as pool:
+            futures = [pool.submit(analyze_one, path, args.output) for _, path in todo]
+            for future in as_completed(futures):
+                finished(future.result())
+    wall_seconds = time.perf_counter() - start
+
+    rows.sort(key=lambda row: names.index(row["video"]))
+    print_summary(rows, frame_counts, wall_seconds)
+    with open(os.path.join(args.output, "summary.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, SUMMARY_FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(
+                {
+                    field: round(value, 3) if isinstance(value, float) else value
+                    for field, value in row.items()
+                }
+            )
+
+    if any(row["status"] == "failed" for row in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import time
+
+from config import Config
+from metrics import JobMetrics
+
+
+class InferenceBatcher:
+    """
+    Collect sampled ROI crops and run them through a model in batches.
+
+    `handler(frame, timestamp, results)` is called once per submitted crop, in
+    submission order, with the same list-of-Results shape that `model(frame)`
+    returns for a single image. A batch is flushed when it holds `batch_size`
+    crops or when its oldest crop has waited `max_wait` seconds of wall time.
+    Model calls are timed as the `<name>_inference` stage of `metrics`.
+    """
+
+    def __init__(
+        self,
+        model,
+        handler,
+        batch_size=Config.INFERENCE_BATCH_SIZE,
+        max_wait=Config.INFERENCE_MAX_WAIT,
+        metrics=None,
+        name="model",
+    ):
+        self.model = model
+        self.handler = handler
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max_wait
+        self.pending = []
+        self.oldest = None
+        self.batches = 0
+        self.frames = 0
+        self.skipped = 0
+        self.metrics = metrics or JobMetrics(enabled=False)
+        self.name = name
+
+    def submit(self, frame, timestamp, infer=True):
+        """Queue a crop for inference, flushing if the batch is due."""
+        if not self.pending:
+            self.oldest = time.monotonic()
+        self.pending.append((frame, timestamp, infer))
+
+        if (
+            len(self.pending) >= self.batch_size
+            or time.monotonic() - self.oldest >= self.max_wait
+        ):
+            self.flush()
+
+    def flush(self):
+        """Run inference on every pending crop and dispatch the results."""
+        if not self.pending:
+            return
+
+        pending, self.pending = self.pending, []
+        frames = [frame for frame, _, infer in pending if infer]
+        results = []
+        if frames:
+            with self.metrics.stage(f"{self.name}_inference"):
+                results = self.model(frames)
+            self.metrics.count(f"{self.name}_frames_inferred", len(frames))
+            self.batches += 1
+        results = iter(results)
+        self.frames += len(frames)
+        self.skipped += len(pending) - len(frames)
+
+        for frame, timestamp, infer in pending:
+            self.handler(frame, timestamp, [next(results)] if infer else None)
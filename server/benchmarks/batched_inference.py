@@ -0,0 +1,76 @@
+"""
+Compare per-crop YOLO calls against batched calls on real kill feed crops.
+
+Usage (from the server directory):
+    python -m benchmarks.batched_inference path/to/video.mp4 [--samples 64]
+"""
+
+import argparse
+import time
+
+from ultralytics import YOLO
+
+from config import Config
+from frame_source import FrameConsumer, FrameSource
+from killlfeed import crop_killfeed
+
+
+class CropCollector(FrameConsumer):
+    """Collect kill feed crops at `fps_target` until `limit` crops are stored."""
+
+    def __init__(self, fps_target, limit):
+        self.fps_target = fps_target
+        self.limit = limit
+        self.crops = []
+
+    def start(self, info):
+        super().start(info)
+        self.frame_interval = max(1, int(info.fps / self.fps_target))
+
+    def wants(self, frame_index):
+        return len(self.crops) < self.limit and frame_index % self.frame_interval == 0
+
+    def consume(self, frame, frame_index, timestamp):
+        crop = crop_killfeed(frame, self.info.width, self.info.height)
+        self.crops.append(crop.copy())
+
+
+def box_count(results):
+    return sum(len(result.boxes) for result in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("video_path")
+    parser.add_argument("--model", default=Config.KILL_FEED_MODEL_PATH)
+    parser.add_argument("--samples", type=int, default=64)
+    parser.add_argument("--batch-sizes", default="1,4,8,16")
+    args = parser.parse_args()
+
+    collector = CropCollector(fps_target=5, limit=args.samples)
+    FrameSource(args.video_path).run([collector])
+    crops = collector.crops
+
+    model = YOLO(args.model)
+    model(crops[0], verbose=False)  # warm up
+
+    start = time.perf_counter()
+    unbatched = [box_count(model(crop, verbose=False)) for crop in crops]
+    baseline = time.perf_counter() - start
+    print(f"Unbatched:     {len(crops) / baseline:7.1f} crops/s")
+
+    for batch_size in map(int, args.batch_sizes.split(",")):
+        start = time.perf_counter()
+        counts = []
+        for i in range(0, len(crops), batch_size):
+            results = model(crops[i : i + batch_size], verbose=False)
+            counts.extend(len(result.boxes) for result in results)
+        elapsed = time.perf_counter() - start
+        print(
+            f"Batch size {batch_size:2d}: {len(crops) / elapsed:7.1f} crops/s "
+            f"({baseline / elapsed:.2f}x, same boxes: {counts == unbatched})"
+        )
+
+
+if __name__ == "__main__":
+    main()
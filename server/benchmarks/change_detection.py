@@ -0,0 +1,106 @@
+"""
+Check that kill feed change detection keeps the scoreboard of the full path.
+
+Runs the kill feed once with every sampled crop inferred and once with change
+detection, then compares the events, the scoreboards, the inference counts and
+how much later change detection reports each kill.
+
+Without a video path a synthetic match is rendered at --resolution and run with
+the stub detector of benchmarks.synthetic twice: over a scrolling background,
+where every crop changes, and over a static one, where only the kill feed does
+and unchanged crops are skipped.
+
+Usage (from the server directory):
+    python -m benchmarks.change_detection [path/to/video.mp4] [--threshold 8.0]
+        [--resolution 720p] [--duration 60]
+"""
+
+import argparse
+import contextlib
+import os
+import tempfile
+import time
+
+from benchmarks.suite import RESOLUTIONS, kill_key
+from benchmarks.synthetic import KillFeedStub, Scenario, render_video
+from config import Config
+from frame_source import FrameSource
+from killlfeed import KillFeedConsumer, build_scoreboard
+from model_registry import get_model
+
+
+def run(video_path, model, change_threshold):
+    consumer = KillFeedConsumer(
+        model,
+        fps_target=Config.KILL_FEED_FPS_TARGET,
+        track_timeout=Config.KILL_FEED_TRACK_TIMEOUT,
+        change_threshold=change_threshold,
+    )
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull:
+        with contextlib.redirect_stdout(devnull):
+            FrameSource(video_path).run([consumer])
+    return consumer, time.perf_counter() - start
+
+
+def compare(video_path, model, threshold):
+    full, full_time = run(video_path, model, None)
+    skipping, skipping_time = run(video_path, model, threshold)
+
+    for name, consumer, elapsed in (
+        ("Every crop", full, full_time),
+        ("Change detection", skipping, skipping_time),
+    ):
+        print(
+            f"{name:17s} {elapsed:7.2f}s  inferred {consumer.frames_inferred:6d}"
+            f"  skipped {consumer.frames_skipped:6d}  events {len(consumer.events)}"
+        )
+
+    print(f"Same events:     {full.events == skipping.events}")
+    print(
+        "Same scoreboard: "
+        f"{build_scoreboard(full.events) == build_scoreboard(skipping.events)}"
+    )
+
+    expected = [kill_key(event) for event in full.events]
+    found = [kill_key(event) for event in skipping.events]
+    if found == expected:
+        lag = max(
+            (b.timestamp - a.timestamp for a, b in zip(full.events, skipping.events)),
+            default=0.0,
+        )
+        print(f"Max event lag:   {lag:.2f}s")
+    else:
+        print(f"Kills differ:    {len(found)} found, {len(expected)} expected")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("video_path", nargs="?")
+    parser.add_argument("--model", default=Config.KILL_FEED_MODEL_PATH)
+    parser.add_argument(
+        "--threshold", type=float, default=Config.KILL_FEED_CHANGE_THRESHOLD
+    )
+    parser.add_argument("--resolution", choices=list(RESOLUTIONS), default="720p")
+    parser.add_argument("--duration", type=float, default=60.0)
+    args = parser.parse_args()
+
+    if args.video_path:
+        compare(args.video_path, get_model(args.model), args.threshold)
+        return
+
+    width, height = RESOLUTIONS[args.resolution]
+    scenario = Scenario.generate(args.duration)
+    with tempfile.TemporaryDirectory() as workdir:
+        for background, scroll in (("scrolling", 4), ("static", 0)):
+            video_path = os.path.join(workdir, f"{background}.mp4")
+            print(
+                f"\n{args.duration:g}s of synthetic {args.resolution}, "
+                f"{background} background"
+            )
+            render_video(scenario, video_path, width, height, scroll)
+            compare(video_path, KillFeedStub(), args.threshold)
+
+
+if __name__ == "__main__":
+    main()
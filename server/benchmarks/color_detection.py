@@ -0,0 +1,147 @@
+"""
+Micro-benchmark team colour classification of kill feed rows.
+
+Compares the original per-row detect_majority_color (one HSV conversion, fresh
+thresholds and kernel per row) against TeamColorClassifier.classify_rows on a
+synthetic kill feed crop, and checks that both give the same labels, also on
+crops of touching rows over textured, noisy backgrounds.
+
+Usage (from the server directory):
+    python -m benchmarks.color_detection [--rows 5] [--frames 2000]
+"""
+
+import argparse
+import math
+import time
+
+import cv2
+import numpy as np
+
+from color_detection import TeamColorClassifier
+
+RED = (40, 40, 220)
+GREEN = (60, 200, 60)
+
+
+def legacy_detect_majority_color(img):
+    """The per-row implementation this benchmark measures against, minus prints."""
+    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    h, w, _ = img.shape
+    split_x = math.floor((w) * 0.65)
+
+    red_lower1, red_upper1 = np.array([0, 100, 100]), np.array([10, 255, 255])
+    red_lower2, red_upper2 = np.array([170, 100, 100]), np.array([180, 255, 255])
+    green_lower, green_upper = np.array([25, 50, 50]), np.array([95, 255, 255])
+
+    red_mask = cv2.inRange(hsv, red_lower1, red_upper1) | cv2.inRange(
+        hsv, red_lower2, red_upper2
+    )
+    green_mask = cv2.inRange(hsv, green_lower, green_upper)
+
+    kernel = np.ones((5, 5), np.uint8)
+    red_mask = cv2.morphologyEx(red_mask, cv2.MORPH_OPEN, kernel)
+    green_mask = cv2.morphologyEx(green_mask, cv2.MORPH_OPEN, kernel)
+
+    left_red = cv2.countNonZero(red_mask[:, :split_x]) / (split_x * h)
+    right_red = cv2.countNonZero(red_mask[:, split_x:]) / ((w - split_x) * h)
+    left_green = cv2.countNonZero(green_mask[:, :split_x]) / (split_x * h)
+    right_green = cv2.countNonZero(green_mask[:, split_x:]) / ((w - split_x) * h)
+
+    return TeamColorClassifier._labels(left_green, left_red, right_green, right_red)
+
+
+def synthetic_killfeed(
+    rows, width=670, row_height=34, gap=8, seed=0, textured=False, noise=0.0
+):
+    """
+    A dark kill feed crop with `rows` rows of red/green killer and victim plates.
+
+    `textured` rows touch and are edged with the other team's colour, thin
+    enough for the opening to remove within a row but not where two edges meet,
+    and have red and green blobs scattered over them and the background, so
+    anything leaking between rows or from the background changes the labels. A
+    `noise` fraction of the pixels gets a random colour.
+    """
+    rng = np.random.default_rng(seed)
+    if textured:
+        gap = 0
+    height = rows * (row_height + gap) + gap
+    img = np.full((height, width, 3), 25, np.uint8)
+    boxes = []
+
+    for i in range(rows):
+        y1 = gap + i * (row_height + gap)
+        y2 = y1 + row_height
+        x1, x2 = 150, width - 10
+        split = x1 + int((x2 - x1) * 0.65)
+        killer, victim = (GREEN, RED) if rng.random() < 0.5 else (RED, GREEN)
+        img[y1:y2, x1:split] = killer
+        img[y1:y2, split:x2] = victim
+        if textured:
+            # Other team's colour along the top and bottom edges of the row
+            for y in (slice(y1, y1 + 3), slice(y2 - 3, y2)):
+                img[y, x1:split] = victim
+                img[y, split:x2] = killer
+        boxes.append((x1, y1, x2, y2))
+
+    if textured:
+        for _ in range(rows * 6):
+            center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+            radius = int(rng.integers(3, 15))
+            cv2.circle(img, center, radius, RED if rng.random() < 0.5 else GREEN, -1)
+    if noise:
+        speckled = rng.random(img.shape[:2]) < noise
+        img[speckled] = rng.integers(0, 256, (int(speckled.sum()), 3))
+
+    jitter = rng.integers(-15, 15, img.shape)
+    return np.clip(img + jitter, 0, 255).astype(np.uint8), boxes
+
+
+def mismatches(classifier, rows, noise, crops=200):
+    """Rows of `crops` synthetic crops whose labels differ from the per-row ones."""
+    differ = 0
+    for seed in range(crops):
+        img, boxes = synthetic_killfeed(rows, seed=seed, textured=True, noise=noise)
+        before = [
+            legacy_detect_majority_color(img[y1:y2, x1:x2]) for x1, y1, x2, y2 in boxes
+        ]
+        after = classifier.classify_rows(img, boxes)
+        differ += sum(a != b for a, b in zip(before, after))
+    return differ
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=5)
+    parser.add_argument("--frames", type=int, default=2000)
+    args = parser.parse_args()
+
+    img, boxes = synthetic_killfeed(args.rows)
+    classifier = TeamColorClassifier()
+
+    start = time.perf_counter()
+    for _ in range(args.frames):
+        before = [
+            legacy_detect_majority_color(img[y1:y2, x1:x2]) for x1, y1, x2, y2 in boxes
+        ]
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(args.frames):
+        after = classifier.classify_rows(img, boxes)
+    shared_time = time.perf_counter() - start
+
+    total_rows = args.frames * len(boxes)
+    print(f"Per-row:    {total_rows / legacy_time:10.0f} rows/s")
+    print(f"Per crop:   {total_rows / shared_time:10.0f} rows/s")
+    print(f"Speedup:    {legacy_time / shared_time:.1f}x")
+    print(f"Same labels: {before == after}")
+
+    # Touching, textured rows: per-row labels only survive if nothing leaks
+    for noise in (0.0, 0.2, 0.4):
+        differ = mismatches(classifier, args.rows, noise)
+        print(f"Textured rows, {noise:.0%} noise: {differ} labels differ")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Compare highlight reel render time with re-encoding and with stream copy.
+
+Renders the same ranges both ways and reports the wall time, the reel duration
+and the peak memory of each run. Ranges are given as START-END seconds, or
+--clips evenly spaced 6 second windows are used.
+
+Usage (from the server directory):
+    python -m benchmarks.highlight_render path/to/video.mp4 [--clips 8]
+        [--range 12-18 --range 40-46 ...] [--mode copy|reencode|both]
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+import cv2
+
+from frame_source import FrameSource
+from highlight import create_highlight_video
+
+
+def render(video_path, ranges, stream_copy, output_path, results):
+    start = time.perf_counter()
+    create_highlight_video(
+        video_path, ranges, stream_copy=stream_copy, output_path=output_path
+    )
+    elapsed = time.perf_counter() - start
+
+    # ru_maxrss is in KiB on Linux; ffmpeg runs as a child process
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    results.put((elapsed, own / 1024, children / 1024))
+
+
+def reel_duration(path):
+    cap = cv2.VideoCapture(path)
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frames = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+        return frames / fps if fps else 0
+    finally:
+        cap.release()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("video_path")
+    parser.add_argument("--clips", type=int, default=8)
+    parser.add_argument("--range", action="append", default=[])
+    parser.add_argument("--mode", choices=["copy", "reencode", "both"], default="both")
+    args = parser.parse_args()
+
+    if args.range:
+        ranges = [tuple(map(float, r.split("-"))) for r in args.range]
+    else:
+        duration = FrameSource(args.video_path).probe().duration
+        step = duration / (args.clips + 1)
+        ranges = [(step * i - 3, step * i + 3) for i in range(1, args.clips + 1)]
+
+    modes = {"copy": [True], "reencode": [False], "both": [False, True]}[args.mode]
+    print(f"{len(ranges)} ranges, {sum(end - start for start, end in ranges):.1f}s")
+
+    # Each mode runs in its own process so peak memory is measured separately
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as workdir:
+        for stream_copy in modes:
+            output_path = os.path.join(workdir, f"reel_{stream_copy}.mp4")
+            results = context.Queue()
+            process = context.Process(
+                target=render,
+                args=(args.video_path, ranges, stream_copy, output_path, results),
+            )
+            process.start()
+            elapsed, own, children = results.get()
+            process.join()
+
+            name = "Stream copy" if stream_copy else "Re-encode"
+            print(
+                f"{name:12s} {elapsed:7.2f}s  reel {reel_duration(output_path):6.1f}s"
+                f"  peak RSS {own:6.0f} MiB (ffmpeg {children:.0f} MiB)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Throughput of the kill feed and weapon analyzers with decode and inference in
+separate processes, by how crops get from the decoder to the workers.
+
+The kill feed and weapon HUD consumers, with the stub detectors of
+benchmarks.synthetic, run three ways:
+
+- single: in the decoding process, over RoiFrameSource;
+- queue: one process each, the decoder pickling every stacked crop image onto
+  a bounded multiprocessing queue per worker;
+- ring: one process each over FrameRing, with the crops in shared memory.
+
+Each reports video frames per second once the workers are up, the total wall
+time including their start-up, and whether the kill events and weapon
+intervals match the single-process run. Without a video path a
+synthetic match is rendered at --resolution. Set --model-latency 0 to measure
+the transport alone.
+
+Usage (from the server directory):
+    python -m benchmarks.ring_buffer [path/to/video.mp4] [--resolution 1080p]
+        [--duration 20] [--model-latency MS] [--slots 32]
+"""
+
+import argparse
+import contextlib
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from functools import partial
+
+import numpy as np
+
+from benchmarks.suite import RESOLUTIONS, kill_key
+from benchmarks.synthetic import KillFeedStub, Scenario, WeaponHudStub, render_video
+from config import Config
+from frame_ring import FrameRing, RingWorker
+from killlfeed import KillFeedConsumer
+from roi_source import RoiFrameSource
+from weapon_tracker import WeaponHudConsumer
+
+
+def quiet():
+    # Worker processes print parser output to the inherited stdout
+    if multiprocessing.parent_process() is not None:
+        sys.stdout = open(os.devnull, "w")
+
+
+def kill_feed_consumer(latency):
+    quiet()
+    return KillFeedConsumer(
+        KillFeedStub(latency), fps_target=Config.KILL_FEED_FPS_TARGET
+    )
+
+
+def weapon_consumer(latency):
+    quiet()
+    return WeaponHudConsumer(WeaponHudStub(latency))
+
+
+def kill_keys(consumer):
+    return [kill_key(event) for event in consumer.events]
+
+
+def weapon_intervals(consumer):
+    return consumer.get_statistics()["intervals"]
+
+
+def run_single(video_path, workers, every, started):
+    consumers = [worker.make() for worker in workers]
+    started.append(time.perf_counter())
+    RoiFrameSource(video_path, every=every).run(consumers)
+    return [worker.collect(c) for worker, c in zip(workers, consumers)]
+
+
+def queue_worker(worker, info, every, offset, frames, results):
+    consumer = worker.make()
+    width, height = consumer.roi(info).output_size
+    consumer.start(info)
+    results.put("ready")
+    while True:
+        item = frames.get()
+        if item is None:
+            break
+        seq, image = item
+        frame_index = seq * every
+        if consumer.wants(frame_index):
+            crop = image[offset : offset + height, :width]
+            consumer.consume_roi(crop, frame_index, frame_index / info.fps)
+    consumer.finish()
+    results.put(worker.collect(consumer))
+
+
+def run_queue(video_path, workers, every, slots, started):
+    source = RoiFrameSource(video_path, every=every)
+    info = source.probe()
+    rois = [worker.make().roi(info) for worker in workers]
+    offsets, shape = source.layout(rois)
+
+    context = multiprocessing.get_context("spawn")
+    queues = [context.Queue(maxsize=slots) for _ in workers]
+    results = [context.Queue() for _ in workers]
+    processes = [
+        context.Process(target=queue_worker, args=(w, info, every, o, q, r))
+        for w, o, q, r in zip(workers, offsets, queues, results)
+    ]
+    for process in processes:
+        process.start()
+    for result in results:
+        result.get()
+    started.append(time.perf_counter())
+
+    decoder = subprocess.Popen(
+        source.command(rois, shape), stdout=subprocess.PIPE, bufsize=0
+    )
+    seq = 0
+    while True:
+        # A new buffer each time, as the queue pickles it in the background
+        image = np.empty(shape, np.uint8)
+        if not source.read_into(decoder.stdout, image):
+            break
+        for frames in queues:
+            frames.put((seq, image))
+        seq += 1
+    decoder.wait()
+
+    for frames in queues:
+        frames.put(None)
+    collected = [result.get() for result in results]
+    for process in processes:
+        process.join()
+    return collected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("video_path", nargs="?")
+    parser.add_argument("--resolution", choices=list(RESOLUTIONS), default="1080p")
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--model-latency", type=float, default=5.0)
+    parser.add_argument("--slots", type=int, default=Config.RING_SLOTS)
+    args = parser.parse_args()
+
+    latency = args.model_latency / 1000
+    workers = [
+        RingWorker(partial(kill_feed_consumer, latency), kill_keys),
+        RingWorker(partial(weapon_consumer, latency), weapon_intervals),
+    ]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        video_path = args.video_path
+        if video_path is None:
+            width, height = RESOLUTIONS[args.resolution]
+            video_path = os.path.join(workdir, f"synthetic_{args.resolution}.mp4")
+            print(f"Rendering {args.duration:g}s of synthetic {args.resolution}")
+            render_video(Scenario.generate(args.duration), video_path, width, height)
+
+        info = RoiFrameSource(video_path).probe()
+        every = max(1, int(info.fps / Config.KILL_FEED_FPS_TARGET))
+        started = []
+        ring = FrameRing(video_path, every, args.slots)
+        modes = {
+            "single": partial(run_single, video_path, workers, every, started),
+            "queue": partial(
+                run_queue, video_path, workers, every, args.slots, started
+            ),
+            # The ring reports progress once its workers are up
+            "ring": partial(
+                ring.run,
+                workers,
+                lambda i, _: i or started.append(time.perf_counter()),
+            ),
+        }
+
+        print(f"{os.cpu_count()} CPUs, model latency {args.model_latency:g} ms")
+        expected = None
+        for name, run in modes.items():
+            started.clear()
+            start = time.perf_counter()
+            with open(os.devnull, "w") as devnull:
+                with contextlib.redirect_stdout(devnull):
+                    collected = run()
+            end = time.perf_counter()
+
+            expected = expected or collected
+            print(
+                f"{name:6s} {info.frame_count / (end - started[0]):8.1f} fps"
+                f"  {end - start:6.2f}s with start-up"
+                f"  same results {collected == expected}"
+            )
+
+
+if __name__ == "__main__":
+    main()
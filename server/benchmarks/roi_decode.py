@@ -0,0 +1,137 @@
+"""
+Compare the bytes each sampled frame costs with OpenCV and with ROI-only decode.
+
+Runs the kill feed and weapon HUD analyzers, with the stub detectors of
+benchmarks.synthetic, once over FrameSource and once over RoiFrameSource. Each
+mode runs in its own process. For each it reports:
+
+- the bytes materialised per sampled frame: full BGR frames plus the
+  1280x720 resize of weapon samples for OpenCV, and pipe bytes for ROI
+  decode;
+- the time spent decoding;
+- the CPU time of the process and of ffmpeg;
+- peak RSS;
+- whether both modes found the same kill events and weapon intervals.
+
+Without a video path a synthetic match is rendered at --resolution.
+
+Usage (from the server directory):
+    python -m benchmarks.roi_decode [path/to/video.mp4] [--resolution 4k]
+        [--duration 10]
+"""
+
+import argparse
+import contextlib
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+from benchmarks.suite import RESOLUTIONS, kill_key
+from benchmarks.synthetic import KillFeedStub, Scenario, WeaponHudStub, render_video
+from config import Config
+from frame_source import FrameSource
+from killlfeed import KillFeedConsumer
+from metrics import JobMetrics
+from roi_source import RoiFrameSource
+from weapon_tracker import WeaponHudConsumer
+
+
+def cpu_seconds(who):
+    usage = resource.getrusage(who)
+    return usage.ru_utime + usage.ru_stime
+
+
+def run(video_path, roi, results):
+    metrics = JobMetrics(enabled=True)
+    killfeed = KillFeedConsumer(
+        KillFeedStub(), fps_target=Config.KILL_FEED_FPS_TARGET, metrics=metrics
+    )
+    weapons = WeaponHudConsumer(WeaponHudStub(), metrics=metrics)
+
+    info = FrameSource(video_path).probe()
+    if roi:
+        source = RoiFrameSource(
+            video_path,
+            every=max(1, int(info.fps / Config.KILL_FEED_FPS_TARGET)),
+            metrics=metrics,
+        )
+    else:
+        source = FrameSource(video_path, metrics=metrics)
+
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        source.run([killfeed, weapons])
+    elapsed = time.perf_counter() - start
+
+    summary = metrics.summary()
+    sampled = summary["counters"].get("frames_sampled", 0)
+    if roi:
+        moved = source.bytes_read
+    else:
+        # A retrieved BGR frame each, plus the 1280x720 resize per weapon sample
+        weapon_samples = summary["stages"].get("weapon_crop", {}).get("calls", 0)
+        moved = sampled * info.width * info.height * 3 + weapon_samples * 1280 * 720 * 3
+
+    results.put(
+        {
+            "seconds": elapsed,
+            "decode": summary["stages"].get("decode", {}).get("seconds", 0.0),
+            "sampled": sampled,
+            "bytes_per_sample": moved / sampled if sampled else 0,
+            "cpu": cpu_seconds(resource.RUSAGE_SELF),
+            "ffmpeg_cpu": cpu_seconds(resource.RUSAGE_CHILDREN),
+            # ru_maxrss is in KiB on Linux
+            "peak_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            "events": [kill_key(event) for event in killfeed.events],
+            "weapons": weapons.get_statistics()["intervals"],
+        }
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("video_path", nargs="?")
+    parser.add_argument("--resolution", choices=list(RESOLUTIONS), default="4k")
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as workdir:
+        video_path = args.video_path
+        if video_path is None:
+            width, height = RESOLUTIONS[args.resolution]
+            video_path = os.path.join(workdir, f"synthetic_{args.resolution}.mp4")
+            print(f"Rendering {args.duration:g}s of synthetic {args.resolution}")
+            render_video(Scenario.generate(args.duration), video_path, width, height)
+
+        runs = {}
+        for name, roi in (("OpenCV", False), ("ROI decode", True)):
+            results = context.Queue()
+            process = context.Process(target=run, args=(video_path, roi, results))
+            process.start()
+            result = runs[name] = results.get()
+            process.join()
+
+            print(
+                f"{name:10s} {result['seconds']:7.2f}s"
+                f"  decode {result['decode']:6.2f}s"
+                f"  {result['sampled']:5d} samples"
+                f"  {result['bytes_per_sample'] / 2**20:7.2f} MiB/sample"
+                f"  CPU {result['cpu']:6.2f}s + ffmpeg {result['ffmpeg_cpu']:6.2f}s"
+                f"  peak RSS {result['peak_rss']:5.0f} MiB"
+            )
+
+    opencv, roi = runs["OpenCV"], runs["ROI decode"]
+    if roi["bytes_per_sample"]:
+        ratio = opencv["bytes_per_sample"] / roi["bytes_per_sample"]
+        print(f"ROI decode moves {ratio:.1f}x fewer bytes per sampled frame")
+    print(
+        f"Same kill events {opencv['events'] == roi['events']}, "
+        f"same weapon intervals {opencv['weapons'] == roi['weapons']}"
+    )
+
+
+if __name__ == "__main__":
+    main()
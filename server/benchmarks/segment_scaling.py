@@ -0,0 +1,62 @@
+"""
+Measure how parallel segment analysis scales with the number of worker processes.
+
+Runs the kill feed and weapon analyzers once sequentially over the whole video,
+then through analyze_video_parallel with 1 to N workers, and checks that every
+parallel run produces the same kill events and weapon statistics.
+
+Usage (from the server directory):
+    python -m benchmarks.segment_scaling path/to/video.mp4 [--workers N]
+        [--segment-length SECONDS]
+"""
+
+import argparse
+import os
+import time
+
+from config import Config
+from frame_source import FrameSource
+from killlfeed import KillFeedConsumer
+from model_registry import get_model
+from segments import analyze_video_parallel
+from weapon_tracker import WeaponHudConsumer
+
+
+def run_sequential(video_path):
+    killfeed = KillFeedConsumer(
+        get_model(Config.KILL_FEED_MODEL_PATH),
+        fps_target=Config.KILL_FEED_FPS_TARGET,
+        track_timeout=Config.KILL_FEED_TRACK_TIMEOUT,
+    )
+    weapons = WeaponHudConsumer(get_model(Config.WEAPON_MODEL_PATH))
+    FrameSource(video_path).run([killfeed, weapons])
+    return killfeed.events, weapons.get_statistics()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("video_path")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--segment-length", type=float, default=Config.SEGMENT_LENGTH)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    expected = run_sequential(args.video_path)
+    sequential_time = time.perf_counter() - start
+    print(f"{'Sequential':>10s} {sequential_time:8.2f}s")
+
+    for workers in range(1, args.workers + 1):
+        start = time.perf_counter()
+        result = analyze_video_parallel(
+            args.video_path, workers=workers, segment_length=args.segment_length
+        )
+        elapsed = time.perf_counter() - start
+        print(
+            f"{workers:>3d} worker{'s' if workers > 1 else ' '}"
+            f" {elapsed:8.2f}s  speedup {sequential_time / elapsed:4.2f}x"
+            f"  same output {result == expected}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,431 @@
+"""
+Throughput benchmark suite on synthetic gameplay video with stub detectors.
+
+Renders a seeded synthetic match (see benchmarks.synthetic) at each resolution
+and runs every stage on it in a fresh process, with the stub detectors
+registered in place of the YOLO weights, so it runs offline on CPU:
+
+    decode                 FrameSource delivering every frame, no analysis
+    get_kill_events        the kill feed analyzer
+    analyze_video          the standalone weapon HUD analyzer
+    pipeline               both analyzers on one decode, as a job runs them
+    parse_frame            KillFeedParser.parse_frame on sampled crops
+    detect_majority_color  team colours of every row in the sampled crops
+
+Each stage reports frames (or calls) per second, latency percentiles of its
+parts, the peak RSS of its process and whether it found the scripted kills and
+weapons. --output writes everything as JSON; --compare prints the fps ratio
+against an earlier JSON file, e.g. one written on another commit.
+
+Usage (from the server directory):
+    python -m benchmarks.suite [--resolutions 720p,1080p,4k] [--duration 20]
+        [--stages get_kill_events,pipeline] [--model-latency MS]
+        [--video-dir DIR] [--output results.json] [--compare old.json]
+"""
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.synthetic import KillFeedStub, Scenario, WeaponHudStub, render_video
+from color_detection import detect_majority_color
+from config import Config
+from frame_source import FrameConsumer, FrameSource
+from killlfeed import (
+    KillFeedConsumer,
+    KillFeedParser,
+    get_kill_events,
+    results_to_detections,
+)
+from model_registry import registry
+from weapon_tracker import WeaponHudConsumer, analyze_video
+
+RESOLUTIONS = {"720p": (1280, 720), "1080p": (1920, 1080), "4k": (3840, 2160)}
+STAGES = [
+    "decode",
+    "get_kill_events",
+    "analyze_video",
+    "pipeline",
+    "parse_frame",
+    "detect_majority_color",
+]
+
+
+def summarize(seconds) -> dict:
+    """Latency percentiles of a list of durations, in milliseconds."""
+    if not seconds:
+        return {"count": 0}
+    ms = np.array(seconds) * 1000
+    p50, p95 = np.percentile(ms, [50, 95])
+    return {
+        "count": len(ms),
+        "mean": float(ms.mean()),
+        "p50": float(p50),
+        "p95": float(p95),
+        "max": float(ms.max()),
+    }
+
+
+def peak_rss_mib():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class TimedConsumer(FrameConsumer):
+    """Forward every hook to `consumer` and time its `consume` calls."""
+
+    def __init__(self, consumer):
+        self.consumer = consumer
+        self.times = []
+
+    def start(self, info):
+        super().start(info)
+        self.consumer.start(info)
+
+    def seek(self, frame_index):
+        self.consumer.seek(frame_index)
+
+    def wants(self, frame_index):
+        return self.consumer.wants(frame_index)
+
+    def next_wanted(self, frame_index):
+        return self.consumer.next_wanted(frame_index)
+
+    def consume(self, frame, frame_index, timestamp):
+        start = time.perf_counter()
+        self.consumer.consume(frame, frame_index, timestamp)
+        self.times.append(time.perf_counter() - start)
+
+    def finish(self):
+        self.consumer.finish()
+
+
+class EveryFrame(FrameConsumer):
+    def __init__(self):
+        self.arrivals = []
+
+    def wants(self, frame_index):
+        return True
+
+    def consume(self, frame, frame_index, timestamp):
+        self.arrivals.append(time.perf_counter())
+
+
+def kill_key(event):
+    return (
+        event.killer,
+        event.weapon,
+        event.victim,
+        event.killer_team,
+        event.victim_team,
+        event.is_headshot,
+    )
+
+
+def weapon_sequence(stats):
+    """Weapon ids in the order they were held, from WeaponTracker statistics."""
+    intervals = sorted(
+        (interval["start"], weapon)
+        for weapon, weapon_intervals in stats["intervals"].items()
+        for interval in weapon_intervals
+    )
+    sequence = []
+    for _, weapon in intervals:
+        if not sequence or sequence[-1] != weapon:
+            sequence.append(weapon)
+    return sequence
+
+
+def check_kills(scenario, events):
+    return {
+        "kills_expected": len(scenario.kills),
+        "kills_found": len(events),
+        "kills_correct": [kill_key(k) for k in scenario.kills]
+        == [kill_key(e) for e in events],
+    }
+
+
+def check_weapons(scenario, stats):
+    expected = []
+    for _, weapon in scenario.weapons:
+        if not expected or expected[-1] != weapon:
+            expected.append(weapon)
+    return {"weapons_correct": weapon_sequence(stats) == expected}
+
+
+def sampled_crops(video_path, model):
+    """Kill feed crops at the kill feed rate with their stub detections."""
+    crops = []
+
+    class Collect(KillFeedConsumer):
+        def _handle_results(self, cropped_frame, timestamp, results):
+            detections = results_to_detections(results)
+            # A copy, so the crop does not keep its whole frame alive
+            crops.append((cropped_frame.copy(), detections, timestamp))
+
+    consumer = Collect(
+        model, fps_target=Config.KILL_FEED_FPS_TARGET, change_threshold=None
+    )
+    FrameSource(video_path).run([consumer])
+    return crops
+
+
+def run_stage(stage, video_path, scenario, model_latency, repeat, workdir):
+    """Run one stage and return its measurements; called in a fresh process."""
+    # Stand-ins for the weights files, registered under their own paths
+    kill_feed_path = os.path.join(workdir, "kill_feed_stub.pt")
+    weapon_path = os.path.join(workdir, "weapon_stub.pt")
+    for path in (kill_feed_path, weapon_path):
+        open(path, "a").close()
+    kill_feed_model = KillFeedStub(model_latency)
+    weapon_model = WeaponHudStub(model_latency)
+    registry.register(kill_feed_path, kill_feed_model)
+    registry.register(weapon_path, weapon_model)
+    Config.WEAPON_MODEL_PATH = weapon_path
+
+    info = FrameSource(video_path).probe()
+    result = {"rss_before_mib": peak_rss_mib()}
+    latency = {}
+
+    # The analyzers print per row and per frame; keep the report readable
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        if stage in ("parse_frame", "detect_majority_color"):
+            crops = sampled_crops(video_path, kill_feed_model)
+
+        start = time.perf_counter()
+        if stage == "decode":
+            consumer = EveryFrame()
+            FrameSource(video_path).run([consumer])
+            latency["frame"] = summarize(list(np.diff(consumer.arrivals)))
+
+        elif stage == "get_kill_events":
+            events = get_kill_events(
+                video_path,
+                kill_feed_path,
+                output_folder=os.path.join(workdir, "frames_output"),
+                fps_target=Config.KILL_FEED_FPS_TARGET,
+            )
+            result.update(check_kills(scenario, events))
+
+        elif stage == "analyze_video":
+            stats = analyze_video(video_path)
+            result.update(check_weapons(scenario, stats))
+
+        elif stage == "pipeline":
+            killfeed = TimedConsumer(
+                KillFeedConsumer(
+                    kill_feed_model, fps_target=Config.KILL_FEED_FPS_TARGET
+                )
+            )
+            weapons = TimedConsumer(WeaponHudConsumer(weapon_model))
+            FrameSource(video_path).run([killfeed, weapons])
+            latency["kill_feed"] = summarize(killfeed.times)
+            latency["weapon_hud"] = summarize(weapons.times)
+            result.update(check_kills(scenario, killfeed.consumer.events))
+            result.update(check_weapons(scenario, weapons.consumer.get_statistics()))
+
+        elif stage == "parse_frame":
+            parser = KillFeedParser()
+            times = []
+            for crop, detections, timestamp in crops * repeat:
+                call = time.perf_counter()
+                parser.parse_frame(crop, detections, timestamp)
+                times.append(time.perf_counter() - call)
+            latency["call"] = summarize(times)
+
+        elif stage == "detect_majority_color":
+            parser = KillFeedParser()
+            times = []
+            for crop, detections, _ in crops * repeat:
+                for row, _ in parser.valid_rows(detections):
+                    x1, y1, x2, y2 = parser.row_bbox(row)
+                    call = time.perf_counter()
+                    detect_majority_color(crop[y1:y2, x1:x2])
+                    times.append(time.perf_counter() - call)
+            latency["call"] = summarize(times)
+
+        seconds = time.perf_counter() - start
+
+    if stage in ("parse_frame", "detect_majority_color"):
+        frames = latency["call"]["count"]
+    else:
+        frames = info.frame_count
+        # Inference of each model call, which may hold a batch of crops
+        for name, model in (("kill_feed", kill_feed_model), ("weapon", weapon_model)):
+            if model.images:
+                latency[f"inference.{name}"] = summarize(model.call_times)
+                result[f"images.{name}"] = model.images
+
+    result.update(
+        {
+            "frames": frames,
+            "seconds": seconds,
+            "fps": frames / seconds if seconds else 0.0,
+            "latency_ms": latency,
+            "peak_rss_mib": peak_rss_mib(),
+        }
+    )
+    return result
+
+
+def _run_stage_process(results, *args):
+    results.put(run_stage(*args))
+
+
+def environment():
+    """Where the numbers come from, so results of different commits line up."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = bool(
+            subprocess.run(
+                ["git", "status", "--porcelain", "--untracked-files=no"],
+                capture_output=True,
+                text=True,
+            ).stdout.strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        commit, dirty = None, None
+
+    return {
+        "commit": commit,
+        "dirty": dirty,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+    }
+
+
+def compare(results, previous):
+    """Print the fps of each run against the same run in `previous`."""
+    before = {(r["resolution"], r["stage"]): r for r in previous["results"]}
+    print(f"\nAgainst {previous['environment'].get('commit') or 'previous run'}:")
+    for result in results:
+        old = before.get((result["resolution"], result["stage"]))
+        if not old or not old["fps"]:
+            continue
+        print(
+            f"{result['resolution']:>6s} {result['stage']:22s}"
+            f" {old['fps']:9.1f} -> {result['fps']:9.1f} fps"
+            f"  {result['fps'] / old['fps']:5.2f}x"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--resolutions", default=",".join(RESOLUTIONS))
+    parser.add_argument("--stages", default=",".join(STAGES))
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--model-latency",
+        type=float,
+        default=0.0,
+        help="Milliseconds each stub inference takes per image",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=10,
+        help="Passes over the sampled crops in parse_frame and detect_majority_color",
+    )
+    parser.add_argument("--video-dir", help="Keep and reuse rendered videos here")
+    parser.add_argument("--output", help="Write the results as JSON")
+    parser.add_argument("--compare", help="JSON results to compare against")
+    args = parser.parse_args()
+
+    resolutions = args.resolutions.split(",")
+    stages = args.stages.split(",")
+    for name in resolutions:
+        if name not in RESOLUTIONS:
+            parser.error(f"unknown resolution {name}, expected {list(RESOLUTIONS)}")
+    for name in stages:
+        if name not in STAGES:
+            parser.error(f"unknown stage {name}, expected {STAGES}")
+
+    scenario = Scenario.generate(args.duration, args.fps, args.seed)
+    context = multiprocessing.get_context("spawn")
+    results = []
+
+    with tempfile.TemporaryDirectory() as workdir:
+        video_dir = args.video_dir or workdir
+        os.makedirs(video_dir, exist_ok=True)
+
+        for name in resolutions:
+            width, height = RESOLUTIONS[name]
+            video_path = os.path.join(
+                video_dir,
+                f"synthetic_{width}x{height}_{args.duration:g}s"
+                f"_{args.fps}fps_seed{args.seed}.mp4",
+            )
+            if not os.path.exists(video_path):
+                print(f"Rendering {os.path.basename(video_path)}")
+                render_video(scenario, video_path, width, height)
+
+            for stage in stages:
+                # A process per stage, so peak RSS belongs to that stage alone
+                queue = context.Queue()
+                process = context.Process(
+                    target=_run_stage_process,
+                    args=(
+                        queue,
+                        stage,
+                        video_path,
+                        scenario,
+                        args.model_latency / 1000,
+                        args.repeat,
+                        workdir,
+                    ),
+                )
+                process.start()
+                result = {"resolution": name, "stage": stage, **queue.get()}
+                process.join()
+                results.append(result)
+
+                correct = [v for k, v in result.items() if k.endswith("_correct")]
+                check = "" if not correct else "  ok" if all(correct) else "  WRONG"
+                print(
+                    f"{name:>6s} {stage:22s} {result['fps']:9.1f} fps"
+                    f"  {result['seconds']:7.2f}s"
+                    f"  peak RSS {result['peak_rss_mib']:6.0f} MiB{check}"
+                )
+
+    report = {
+        "environment": environment(),
+        "settings": {
+            "duration": args.duration,
+            "fps": args.fps,
+            "seed": args.seed,
+            "model_latency_ms": args.model_latency,
+            "repeat": args.repeat,
+            "kills": len(scenario.kills),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""
+Synthetic gameplay video and stub detectors for offline benchmarks.
+
+A Scenario is a seeded script of kills and weapon changes. render_video draws
+it at any resolution: a grey background, scrolling unless told not to, kill
+feed rows with team coloured halves and grey icons in the top right, and a
+weapon icon in the HUD, all where crop_killfeed and crop_weapon_hud look for
+them. Every icon is a
+flat square whose grey level encodes its class, with levels far enough apart to
+survive mp4v compression.
+
+KillFeedStub and WeaponHudStub stand in for the YOLO models. They read the icons
+back from the known layout and return Results-shaped boxes, so the pipeline
+runs on CPU without weights and its output can be checked against the script.
+"""
+
+import math
+import random
+import time
+from dataclasses import dataclass, field
+from typing import List
+
+import cv2
+import numpy as np
+import torch
+
+from constants import CHARACTER_CLASSES, CLASS_MAPPING, WEAPON_CLASSES
+from weapon_tracker import weapon_dict
+
+GREEN = (60, 200, 60)
+RED = (40, 40, 220)
+
+CLASS_IDS = {name: class_id for class_id, name in CLASS_MAPPING.items()}
+AGENTS = [name for name in CHARACTER_CLASSES if name in CLASS_IDS][::2]
+GUNS = [name for name in WEAPON_CLASSES if name in CLASS_IDS][:9]
+PALETTE = ["Headshot"] + AGENTS + GUNS  # kill feed icons, by grey level
+
+# Kill feed layout at 720p, in pixels of the crop_killfeed region
+ROW_TOP, ROW_PITCH, ROW_HEIGHT = 10, 34, 26
+ROW_UNIT, ROW_MARGIN = 8, 10  # a row is 10 units wide, right-aligned
+ICONS = {  # icon: (first unit, last unit)
+    "killer": (0, 2),
+    "weapon": (3, 5),
+    "headshot": (5.3, 6),
+    "victim": (8, 10),
+}
+KILLER_GAP = (2, 3)  # killer colour shows between the killer and weapon icons
+SPLIT = 6.5  # where the victim colour starts, matching TeamColorClassifier
+
+# Weapon HUD layout at 720p, matching crop_weapon_hud
+HUD_X, HUD_Y, HUD_WIDTH, HUD_HEIGHT = 1070, 458, 210, 178
+HUD_ICON = 40  # half-width of the weapon icon
+
+
+def icon_level(code, step=10):
+    return 16 + step * code
+
+
+def read_level(patch, step=10):
+    """Code of a flat grey icon, or None when the patch is not grey."""
+    mean = patch.reshape(-1, 3).mean(axis=0)
+    if mean.max() - mean.min() > 24:
+        return None
+    return int(round((mean.mean() - 16) / step))
+
+
+@dataclass
+class Kill:
+    time: float
+    killer: str
+    weapon: str
+    victim: str
+    killer_team: str
+    is_headshot: bool
+
+    @property
+    def victim_team(self):
+        return "red" if self.killer_team == "green" else "green"
+
+
+@dataclass
+class Scenario:
+    duration: float = 30.0
+    fps: int = 30
+    seed: int = 0
+    row_duration: float = 5.0  # seconds a kill feed row stays on screen
+    max_rows: int = 5
+    kills: List[Kill] = field(default_factory=list)
+    weapons: List[tuple] = field(default_factory=list)  # (start time, class id)
+
+    @classmethod
+    def generate(cls, duration=30.0, fps=30, seed=0, kill_gap=(1.2, 3.0)):
+        """Script kills `kill_gap` seconds apart and a weapon change every few."""
+        scenario = cls(duration=duration, fps=fps, seed=seed)
+        rng = random.Random(seed)
+
+        t = 1.0
+        while t < duration - 1:
+            killer, victim = rng.sample(AGENTS, 2)
+            scenario.kills.append(
+                Kill(
+                    time=round(t * fps) / fps,
+                    killer=killer,
+                    weapon=rng.choice(GUNS),
+                    victim=victim,
+                    killer_team=rng.choice(["green", "red"]),
+                    is_headshot=rng.random() < 0.3,
+                )
+            )
+            t += rng.uniform(*kill_gap)
+
+        t = 0.0
+        while t < duration:
+            scenario.weapons.append((t, rng.choice(sorted(weapon_dict))))
+            t += rng.randint(3, 7)
+
+        return scenario
+
+    def visible_rows(self, t) -> List[Kill]:
+        """Rows on screen at `t`, oldest first, each one slot below the last."""
+        rows = [k for k in self.kills if k.time <= t < k.time + self.row_duration]
+        return rows[-self.max_rows :]
+
+    def weapon_at(self, t):
+        current = None
+        for start, class_id in self.weapons:
+            if start <= t:
+                current = class_id
+        return current
+
+
+def row_box(slot, scale, crop_width):
+    """Pixel box of a kill feed row in crop_killfeed coordinates."""
+    unit = ROW_UNIT * scale
+    x2 = crop_width - ROW_MARGIN * scale
+    x1 = x2 - 10 * unit
+    y1 = (ROW_TOP + slot * ROW_PITCH) * scale
+    return x1, y1, x2, y1 + ROW_HEIGHT * scale
+
+
+def icon_box(slot, icon, scale, crop_width):
+    x1, y1, _, y2 = row_box(slot, scale, crop_width)
+    first, last = ICONS[icon]
+    unit = ROW_UNIT * scale
+    return x1 + first * unit, y1, x1 + last * unit, y2
+
+
+class Renderer:
+    """
+    Draw the frames of a scenario at one resolution.
+
+    The background moves `scroll` pixels per frame; with 0 only the kill feed and
+    the HUD change, as in a static scene.
+    """
+
+    def __init__(self, scenario: Scenario, width, height, scroll=4):
+        self.scenario = scenario
+        self.width, self.height = width, height
+        self.scroll = scroll
+        self.scale = height / 720
+
+        # Kill feed crop, as crop_killfeed takes it
+        self.feed_top = 70
+        self.feed_left = math.floor(0.65 * width)
+        self.feed_width = width - self.feed_left
+
+        rng = np.random.default_rng(scenario.seed)
+        noise = rng.integers(0, 60, (height // 8 + 1, width // 8 + 1), np.uint8)
+        background = cv2.resize(noise, (width, height), interpolation=cv2.INTER_LINEAR)
+        self.background = cv2.cvtColor(background, cv2.COLOR_GRAY2BGR)
+
+    def _rect(self, frame, box, color, top=0, left=0):
+        x1, y1, x2, y2 = (int(round(v)) for v in box)
+        frame[top + y1 : top + y2, left + x1 : left + x2] = color
+
+    def frame(self, index):
+        t = index / self.scenario.fps
+        frame = np.roll(self.background, index * self.scroll, axis=1)
+
+        for slot, kill in enumerate(self.scenario.visible_rows(t)):
+            x1, y1, x2, y2 = row_box(slot, self.scale, self.feed_width)
+            split = x1 + SPLIT * ROW_UNIT * self.scale
+            offset = dict(top=self.feed_top, left=self.feed_left)
+            killer_color = GREEN if kill.killer_team == "green" else RED
+            victim_color = RED if kill.killer_team == "green" else GREEN
+            self._rect(frame, (x1, y1, split, y2), killer_color, **offset)
+            self._rect(frame, (split, y1, x2, y2), victim_color, **offset)
+
+            icons = {
+                "killer": kill.killer,
+                "weapon": kill.weapon,
+                "victim": kill.victim,
+            }
+            if kill.is_headshot:
+                icons["headshot"] = "Headshot"
+            for icon, name in icons.items():
+                box = icon_box(slot, icon, self.scale, self.feed_width)
+                level = icon_level(PALETTE.index(name))
+                self._rect(frame, box, (level,) * 3, **offset)
+
+        weapon = self.scenario.weapon_at(t)
+        if weapon is not None:
+            sx, sy = self.width / 1280, self.height / 720
+            cx, cy = HUD_X + HUD_WIDTH / 2, HUD_Y + HUD_HEIGHT / 2
+            box = (
+                (cx - HUD_ICON) * sx,
+                (cy - HUD_ICON / 2) * sy,
+                (cx + HUD_ICON) * sx,
+                (cy + HUD_ICON / 2) * sy,
+            )
+            self._rect(frame, box, (icon_level(weapon, step=12),) * 3)
+
+        return frame
+
+
+def render_video(scenario: Scenario, path, width, height, scroll=4):
+    """Write the scenario to `path` as an mp4 and return its path."""
+    renderer = Renderer(scenario, width, height, scroll)
+    writer = cv2.VideoWriter(
+        path, cv2.VideoWriter_fourcc(*"mp4v"), scenario.fps, (width, height)
+    )
+    try:
+        for index in range(int(scenario.duration * scenario.fps)):
+            writer.write(renderer.frame(index))
+    finally:
+        writer.release()
+    return path
+
+
+class StubBoxes:
+    """The parts of ultralytics Boxes the analyzers use, over an (N, 6) tensor."""
+
+    def __init__(self, data):
+        self.data = torch.as_tensor(data, dtype=torch.float32).reshape(-1, 6)
+
+    @property
+    def conf(self):
+        return self.data[:, 4]
+
+    @property
+    def cls(self):
+        return self.data[:, 5]
+
+    def __len__(self):
+        return len(self.data)
+
+    def __iter__(self):
+        return (StubBoxes(row) for row in self.data)
+
+
+@dataclass
+class StubResult:
+    boxes: StubBoxes
+    names: dict
+
+
+class StubModel:
+    """
+    Base for the stand-in detectors.
+
+    Called like a YOLO model with one image or a list of them, returning one
+    StubResult per image. `latency` seconds per image are slept to mimic the
+    cost of a real model; every call's wall time is kept in `call_times`.
+    """
+
+    names = {}
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.call_times = []
+        self.images = 0
+
+    def __call__(self, images, **kwargs):
+        start = time.perf_counter()
+        if isinstance(images, np.ndarray):
+            images = [images]
+
+        results = [
+            StubResult(StubBoxes(self.detect(image)), self.names) for image in images
+        ]
+        if self.latency:
+            time.sleep(self.latency * len(images))
+
+        self.images += len(images)
+        self.call_times.append(time.perf_counter() - start)
+        return results
+
+    def detect(self, image):
+        raise NotImplementedError
+
+
+class KillFeedStub(StubModel):
+    """Detect the kill feed icons that Renderer drew in a crop_killfeed crop."""
+
+    names = CLASS_MAPPING
+
+    def detect(self, image):
+        height, width = image.shape[:2]
+        # The crop is 35% of the frame width, which is 448 pixels at 720p
+        scale = width / (1280 - math.floor(0.65 * 1280))
+
+        rows = []
+        for slot in range(Scenario.max_rows):
+            x1, y1, _, y2 = row_box(slot, scale, width)
+            if y2 > height:
+                break
+
+            unit = ROW_UNIT * scale
+            gap = self._patch(
+                image, (x1 + KILLER_GAP[0] * unit, y1, x1 + KILLER_GAP[1] * unit, y2)
+            )
+            if read_level(gap) is not None:
+                continue  # no coloured row in this slot
+
+            for icon in ICONS:
+                box = icon_box(slot, icon, scale, width)
+                code = read_level(self._patch(image, box))
+                if code is not None and code < len(PALETTE):
+                    rows.append([*box, 0.9, CLASS_IDS[PALETTE[code]]])
+
+        return rows
+
+    @staticmethod
+    def _patch(image, box):
+        # The middle of a box, clear of compression artefacts at its edges
+        x1, y1, x2, y2 = box
+        dx, dy = (x2 - x1) / 4, (y2 - y1) / 4
+        return image[int(y1 + dy) : int(y2 - dy), int(x1 + dx) : int(x2 - dx)]
+
+
+class WeaponHudStub(StubModel):
+    """Detect the weapon icon that Renderer drew in a crop_weapon_hud crop."""
+
+    def detect(self, image):
+        cy, cx = HUD_HEIGHT // 2, HUD_WIDTH // 2
+        patch = image[cy - 8 : cy + 8, cx - 16 : cx + 16]
+        class_id = read_level(patch, step=12)
+        if class_id is None or class_id not in weapon_dict:
+            return []
+        return [
+            [
+                cx - HUD_ICON,
+                cy - HUD_ICON / 2,
+                cx + HUD_ICON,
+                cy + HUD_ICON / 2,
+                0.9,
+                class_id,
+            ]
+        ]
@@ -0,0 +1,56 @@
+"""
+Compare per-second weapon HUD sampling by seek-and-reopen against sequential streaming.
+
+Usage (from the server directory):
+    python -m benchmarks.weapon_stream path/to/video.mp4 [--limit SECONDS]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from weapon_tracker import extract_video_duration, seek_frames, stream_frames
+
+
+def time_frames(frames, video_path, timestamps):
+    start = time.perf_counter()
+    crops = {timestamp: frame for timestamp, frame in frames(video_path, timestamps)}
+    return time.perf_counter() - start, crops
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("video_path")
+    parser.add_argument(
+        "--limit", type=float, default=None, help="Only sample the first N seconds"
+    )
+    args = parser.parse_args()
+
+    duration = extract_video_duration(args.video_path)
+    if args.limit is not None:
+        duration = min(duration, args.limit)
+    timestamps = np.arange(0, duration, 1.0)
+
+    seek_time, seek_crops = time_frames(seek_frames, args.video_path, timestamps)
+    stream_time, stream_crops = time_frames(stream_frames, args.video_path, timestamps)
+
+    matching = sum(
+        1
+        for timestamp, frame in seek_crops.items()
+        if timestamp in stream_crops and np.array_equal(frame, stream_crops[timestamp])
+    )
+
+    print(f"Samples:        {len(timestamps)}")
+    print(
+        f"Seek + reopen:  {seek_time:.2f}s ({len(timestamps) / seek_time:.1f} samples/s)"
+    )
+    print(
+        f"Streaming:      {stream_time:.2f}s ({len(timestamps) / stream_time:.1f} samples/s)"
+    )
+    print(f"Speedup:        {seek_time / stream_time:.1f}x")
+    print(f"Identical crops: {matching}/{len(seek_crops)}")
+
+
+if __name__ == "__main__":
+    main()
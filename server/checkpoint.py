@@ -0,0 +1,75 @@
+import os
+import pickle
+import tempfile
+import time
+
+from config import Config
+
+
+class Checkpoint:
+    """
+    Periodic snapshot of how far an analysis got, in a small local file.
+
+    `save(position, state)` writes the position and the analyzers' state at most
+    once every `interval` seconds of wall time, atomically, so a run that dies
+    leaves the last complete snapshot. `load()` returns it to the restarted run,
+    but only if the video is the same file, unchanged, and `settings` are equal;
+    a snapshot of anything else would not reproduce the uninterrupted result.
+    """
+
+    def __init__(
+        self, path, video_path, settings=None, interval=Config.CHECKPOINT_INTERVAL
+    ):
+        self.path = path
+        self.interval = interval
+        self.last_save = time.monotonic()
+
+        stat = os.stat(video_path)
+        self.identity = {
+            "video": os.path.abspath(video_path),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "settings": settings or {},
+        }
+
+    def load(self):
+        """Return (position, state) of the last snapshot, or None to start over."""
+        try:
+            with open(self.path, "rb") as f:
+                snapshot = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except (pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+            print(f"Warning: Ignoring unreadable checkpoint {self.path}")
+            return None
+
+        if snapshot.get("identity") != self.identity:
+            print(f"Warning: Ignoring checkpoint {self.path} of another analysis")
+            return None
+
+        print(f"Resuming from checkpoint {self.path} at {snapshot['position']}")
+        return snapshot["position"], snapshot["state"]
+
+    def due(self) -> bool:
+        return time.monotonic() - self.last_save >= self.interval
+
+    def save(self, position, state):
+        snapshot = {"identity": self.identity, "position": position, "state": state}
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(self.path) or ".", suffix=".part"
+        )
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(snapshot, f)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        self.last_save = time.monotonic()
+
+    def clear(self):
+        """Remove the snapshot once the analysis has finished."""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -1,78 +1,116 @@
 import math
+
 import cv2
 import numpy as np
 
 
-def detect_majority_color(img):
-    # Read image
+class TeamColorClassifier:
+    """
+    Classify the killer/victim team colours of kill feed rows.
+
+    Thresholds and the morphology kernel are built once. `classify_rows` converts
+    the region covering every row of a crop to HSV and thresholds the red/green
+    masks a single time, then opens each row's part of the masks on its own, as
+    a crop of just that row would be, and counts its pixels on both sides.
+    """
+
+    def __init__(self, split=0.65):
+        self.split = split
+
+        # Define color ranges for red (two ranges) and green
+        self.red_lower1 = np.array([0, 100, 100], dtype=np.uint8)
+        self.red_upper1 = np.array([10, 255, 255], dtype=np.uint8)
+        self.red_lower2 = np.array([170, 100, 100], dtype=np.uint8)
+        self.red_upper2 = np.array([180, 255, 255], dtype=np.uint8)
+        self.green_lower = np.array([25, 50, 50], dtype=np.uint8)
+        self.green_upper = np.array([95, 255, 255], dtype=np.uint8)
+
+        self.kernel = np.ones((5, 5), np.uint8)
+
+    def classify_rows(self, img, boxes):
+        """
+        Return a [killer_team, victim_team] pair for each (x1, y1, x2, y2) box.
+
+        Boxes are in pixel coordinates of `img` and are clipped to it. Only the
+        region spanned by the boxes is converted.
+        """
+        if len(boxes) == 0:
+            return []
+
+        h, w = img.shape[:2]
+        clipped = []
+        for x1, y1, x2, y2 in boxes:
+            x1, y1 = min(max(int(x1), 0), w), min(max(int(y1), 0), h)
+            x2, y2 = min(max(int(x2), x1), w), min(max(int(y2), y1), h)
+            clipped.append((x1, y1, x2, y2))
+
+        # Work on the region covering every row, in its own coordinates
+        left = min(box[0] for box in clipped)
+        top = min(box[1] for box in clipped)
+        right = max(box[2] for box in clipped)
+        bottom = max(box[3] for box in clipped)
+        if right == left or bottom == top:
+            return [self._labels(0, 0, 0, 0) for _ in clipped]
+
+        # Masks for red and green
+        hsv = cv2.cvtColor(img[top:bottom, left:right], cv2.COLOR_BGR2HSV)
+        red_mask = cv2.inRange(hsv, self.red_lower1, self.red_upper1) | cv2.inRange(
+            hsv, self.red_lower2, self.red_upper2
+        )
+        green_mask = cv2.inRange(hsv, self.green_lower, self.green_upper)
+
+        labels = []
+        for x1, y1, x2, y2 in clipped:
+            if x2 == x1 or y2 == y1:
+                labels.append(self._labels(0, 0, 0, 0))
+                continue
+
+            # Apply morphological opening to refine detection, within the row
+            # only so neighbouring rows and the background cannot leak in
+            row = (slice(y1 - top, y2 - top), slice(x1 - left, x2 - left))
+            row_red = cv2.morphologyEx(red_mask[row], cv2.MORPH_OPEN, self.kernel)
+            row_green = cv2.morphologyEx(green_mask[row], cv2.MORPH_OPEN, self.kernel)
+
+            # Vertical line slightly to the right of center of the row
+            split_x = math.floor((x2 - x1) * self.split)
+            counts = []
+            for side in (slice(None, split_x), slice(split_x, None)):
+                counts.append(cv2.countNonZero(row_green[:, side]))
+                counts.append(cv2.countNonZero(row_red[:, side]))
+
+            # Both colours share a side's pixel total, so counts compare like
+            # percentages
+            labels.append(self._labels(*counts))
+
+        return labels
+
+    @staticmethod
+    def _labels(left_green, left_red, right_green, right_red):
+        result = []
+
+        if left_green > left_red:
+            result.append("green")
+        if left_green < left_red:
+            result.append("red")
+        if right_green > right_red:
+            result.append("green")
+        if right_green < right_red:
+            result.append("red")
+
+        if len(result) == 0:
+            result = ["green", "red"]
+        elif len(result) == 1 and result[0] == "red":
+            result.append("green")
+        elif len(result) == 1 and result[0] == "green":
+            result.append("red")
+
+        return result
+
+
+team_color_classifier = TeamColorClassifier()
 
-    # Convert to HSV
-    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-    h, w, _ = img.shape
 
-    # Vertical line slightly to the right of center
-
-    split_x = math.floor((w) * 0.65)
-
-    # Define color ranges for red (two ranges) and green
-    red_lower1, red_upper1 = np.array([0, 100, 100]), np.array([10, 255, 255])
-    red_lower2, red_upper2 = np.array([170, 100, 100]), np.array([180, 255, 255])
-    green_lower, green_upper = np.array([25, 50, 50]), np.array([95, 255, 255])
-
-    # Masks for red and green
-    red_mask = cv2.inRange(hsv, red_lower1, red_upper1) | cv2.inRange(
-        hsv, red_lower2, red_upper2
-    )
-    green_mask = cv2.inRange(hsv, green_lower, green_upper)
-
-    # Apply morphological opening to refine detection
-    kernel = np.ones((5, 5), np.uint8)
-    red_mask = cv2.morphologyEx(red_mask, cv2.MORPH_OPEN, kernel)
-    green_mask = cv2.morphologyEx(green_mask, cv2.MORPH_OPEN, kernel)
-
-    # Split the image into two sides
-    left_red = red_mask[:, :split_x]
-    right_red = red_mask[:, split_x:]
-    left_green = green_mask[:, :split_x]
-    right_green = green_mask[:, split_x:]
-
-    # Count red/green pixels per side
-    left_red_count = cv2.countNonZero(left_red)
-    right_red_count = cv2.countNonZero(right_red)
-    left_green_count = cv2.countNonZero(left_green)
-    right_green_count = cv2.countNonZero(right_green)
-
-    # Total pixels per side
-    left_pixels = split_x * h
-    right_pixels = (w - split_x) * h
-
-    # Calculate percentages
-    left_red_perc = (left_red_count / left_pixels) * 100
-    right_red_perc = (right_red_count / right_pixels) * 100
-    left_green_perc = (left_green_count / left_pixels) * 100
-    right_green_perc = (right_green_count / right_pixels) * 100
-
-    result = []
-
-    # Print results
-    if left_green_perc > left_red_perc:
-        result.append("green")
-        print("green", end=" ")
-    if left_green_perc < left_red_perc:
-        result.append("red")
-        print("red", end=" ")
-    if right_green_perc > right_red_perc:
-        result.append("green")
-        print("green", end=" ")
-    if right_green_perc < right_red_perc:
-        result.append("red")
-        print("red", end=" ")
-
-    if len(result) == 0:
-        result = ["green", "red"]
-    elif len(result) == 1 and result[0] == "red":
-        result.append("green")
-    elif len(result) == 1 and result[0] == "green":
-        result.append("red")
-
-    return result
+def detect_majority_color(img):
+    """Classify a single cropped kill feed row."""
+    h, w, _ = img.shape
+    return team_color_classifier.classify_rows(img, [(0, 0, w, h)])[0]
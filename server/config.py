@@ -3,3 +3,40 @@ class Config:
     KILL_FEED_MODEL_PATH = "models/killfeed_model.pt"
     WEAPON_MODEL_PATH = "models/weapon_model.pt"
     CSV_LOG_PATH = "valorant_data.csv"
+    HIGHLIGHT_FOLDER = "highlights"
+    HIGHLIGHT_STREAM_COPY = True  # cut reels on keyframes without re-encoding
+    INFERENCE_BATCH_SIZE = 8  # ROI crops per YOLO call
+    INFERENCE_MAX_WAIT = 0.5  # seconds a crop may wait for its batch to fill
+    RING_SLOTS = 32  # shared-memory crop slots between the decoder and its workers
+    ROI_DECODE = False  # get_kill_events has ffmpeg decode only the kill feed region
+    JOB_WORKERS = 2  # analysis jobs running at once
+    JOB_QUEUE_SIZE = 8  # jobs waiting for a worker before /upload returns 429
+    JOB_HISTORY = 100  # finished jobs kept for the status endpoints
+    JOB_EVENTS_INTERVAL = 1.0  # seconds between progress messages on /jobs/<id>/events
+    KILL_FEED_FPS_TARGET = 5
+    KILL_FEED_TRACK_TIMEOUT = 1.0  # seconds a kill feed row may go unseen
+    RESULT_CACHE_FOLDER = "result_cache"
+    RESULT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+    EVENT_STORE_PATH = "events.db"  # SQLite store of every analysed match
+    WEAPON_CACHE_SIZE = 64  # weapon HUD classifications reused by look; 0 disables
+    KILL_FEED_CHANGE_THRESHOLD = 8.0  # grey-level change of any cell forcing inference
+    KILL_FEED_MAX_SKIP = 10  # inference is forced after this many unchanged crops
+    KILL_FEED_MAX_LATENCY = 1.0  # seconds before a new kill feed row must be seen
+    KILL_FEED_QUIET_PERIOD = 3.0  # seconds without rows before sampling slows down
+    CHECKPOINT_INTERVAL = 30.0  # seconds between checkpoints of a resumable run
+    CHECKPOINT_FOLDER = "checkpoints"  # progress of running jobs, resumed on restart
+    METRICS = True  # time each analysis stage per job; off costs next to nothing
+    DEBUG_ARTIFACTS = False  # save intermediate crops for debugging
+    DEBUG_ARTIFACT_FOLDER = "debug_artifacts"  # one subfolder per job
+    DEBUG_ARTIFACT_SAMPLE_RATE = 0.1  # fraction of crops of each kind that are saved
+    DEBUG_ARTIFACT_QUEUE_SIZE = 64  # images waiting to be written before new ones drop
+    BATCH_OUTPUT_FOLDER = "batch_results"  # results of batch.py runs
+    BATCH_THREADS = 2  # CPU cores per video batch.py analyzes at once
+    SEGMENT_WORKERS = 4  # processes used to analyse one video in parallel segments
+    SEGMENT_LENGTH = 120  # seconds of video per segment
+    SEGMENT_OVERLAP = 3.0  # seconds decoded before a segment to warm up row tracking
+    FFMPEG_BINARY = None  # None uses the ffmpeg bundled with moviepy (imageio-ffmpeg)
+    LIVE_FPS = 30  # live input is resampled to this frame rate
+    LIVE_FRAME_SIZE = (1920, 1080)  # width x height live frames are scaled to
+    LIVE_QUEUE_SIZE = 4  # decoded frames buffered before the oldest are dropped
+    LIVE_LATENCY_WINDOW = 1000  # latest end-to-end latencies kept for percentiles
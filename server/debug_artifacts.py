@@ -0,0 +1,101 @@
+import os
+import queue
+import threading
+from collections import defaultdict
+
+import cv2
+
+from config import Config
+
+
+class ArtifactWriter:
+    """
+    Encode and write debug images on a background thread.
+
+    At most `max_pending` images wait to be written; when the queue is full new
+    images are dropped rather than blocking the analysis that produced them.
+    """
+
+    def __init__(self, max_pending=Config.DEBUG_ARTIFACT_QUEUE_SIZE):
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.thread = None
+        self.lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+
+    def write(self, path, image):
+        """Queue `image` to be written to `path`; return False if it was dropped."""
+        self._ensure_thread()
+        try:
+            self.queue.put_nowait((path, image))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def join(self):
+        """Block until every queued image has been written."""
+        self.queue.join()
+
+    def _ensure_thread(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self._run, name="artifact-writer", daemon=True
+                )
+                self.thread.start()
+
+    def _run(self):
+        while True:
+            path, image = self.queue.get()
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                cv2.imwrite(path, image)
+                self.written += 1
+            except Exception as e:
+                print(f"Could not write debug artifact {path}: {e}")
+            finally:
+                self.queue.task_done()
+
+
+artifact_writer = ArtifactWriter()
+
+
+class DebugArtifacts:
+    """
+    Per-job handle for saving intermediate images while debugging.
+
+    Disabled unless Config.DEBUG_ARTIFACTS is set, in which case `save` keeps a
+    `sample_rate` fraction of the images of each kind under
+    `<folder>/<job_id>/<kind>/` and hands them to the shared background writer.
+    """
+
+    def __init__(
+        self,
+        job_id="local",
+        enabled=Config.DEBUG_ARTIFACTS,
+        sample_rate=Config.DEBUG_ARTIFACT_SAMPLE_RATE,
+        folder=Config.DEBUG_ARTIFACT_FOLDER,
+        writer=artifact_writer,
+    ):
+        self.enabled = enabled and sample_rate > 0
+        self.every = max(1, round(1 / sample_rate)) if self.enabled else 0
+        self.directory = os.path.join(folder, str(job_id))
+        self.writer = writer
+        self.counts = defaultdict(int)
+        self.dropped = 0
+
+    def save(self, kind, name, image):
+        """Queue `image` as `<kind>/<name>` if it falls within the sample rate."""
+        if not self.enabled or image is None or image.size == 0:
+            return
+
+        count = self.counts[kind]
+        self.counts[kind] += 1
+        if count % self.every:
+            return
+
+        # Copy, since the caller may reuse or keep modifying the array
+        path = os.path.join(self.directory, kind, name)
+        if not self.writer.write(path, image.copy()):
+            self.dropped += 1
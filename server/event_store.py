@@ -0,0 +1,194 @@
+import json
+import sqlite3
+import time
+from contextlib import closing
+from typing import List, Optional
+
+from config import Config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS matches (
+    id TEXT PRIMARY KEY,
+    video_hash TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS matches_created_at ON matches (created_at);
+
+CREATE TABLE IF NOT EXISTS kill_events (
+    match_id TEXT NOT NULL REFERENCES matches (id) ON DELETE CASCADE,
+    timestamp REAL NOT NULL,
+    killer TEXT NOT NULL,
+    killer_team TEXT NOT NULL,
+    victim TEXT NOT NULL,
+    victim_team TEXT NOT NULL,
+    weapon TEXT NOT NULL,
+    is_headshot INTEGER NOT NULL,
+    is_wallbang INTEGER NOT NULL,
+    assists TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS kill_events_match ON kill_events (match_id, timestamp);
+CREATE INDEX IF NOT EXISTS kill_events_killer ON kill_events (killer, weapon);
+CREATE INDEX IF NOT EXISTS kill_events_victim ON kill_events (victim);
+CREATE INDEX IF NOT EXISTS kill_events_weapon ON kill_events (weapon);
+CREATE INDEX IF NOT EXISTS kill_events_team ON kill_events (killer_team);
+
+CREATE TABLE IF NOT EXISTS weapon_intervals (
+    match_id TEXT NOT NULL REFERENCES matches (id) ON DELETE CASCADE,
+    weapon TEXT NOT NULL,
+    start_time REAL NOT NULL,
+    end_time REAL NOT NULL,
+    duration REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS weapon_intervals_match ON weapon_intervals (match_id);
+CREATE INDEX IF NOT EXISTS weapon_intervals_weapon ON weapon_intervals (weapon);
+"""
+
+
+class EventStore:
+    """
+    SQLite store of the kill events and weapon intervals of every analysed match.
+
+    Each call opens its own connection, so one store can be shared by the job
+    threads and the request handlers. Queries can be limited to the most recent
+    `last_matches` matches and only read the rows they need through indexes.
+    """
+
+    def __init__(self, path=Config.EVENT_STORE_PATH):
+        self.path = path
+        with closing(self._connect()) as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute("PRAGMA foreign_keys=ON")
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def add_match(self, match_id, events, weapon_stats, video_hash=None):
+        """
+        Store the events and weapon intervals of a match, replacing earlier ones.
+
+        `events` are KillEvents and `weapon_stats` is WeaponTracker statistics.
+        """
+        names = weapon_stats.get("weapon_names", {})
+        intervals = [
+            (
+                match_id,
+                names.get(weapon, str(weapon)),
+                i["start"],
+                i["end"],
+                i["duration"],
+            )
+            for weapon, weapon_intervals in weapon_stats.get("intervals", {}).items()
+            for i in weapon_intervals
+        ]
+        kills = [
+            (
+                match_id,
+                event.timestamp,
+                event.killer,
+                event.killer_team,
+                event.victim,
+                event.victim_team,
+                event.weapon,
+                int(event.is_headshot),
+                int(event.is_wallbang),
+                json.dumps(event.assist or []),
+            )
+            for event in events
+        ]
+
+        with closing(self._connect()) as connection, connection:
+            connection.execute("DELETE FROM matches WHERE id = ?", (match_id,))
+            connection.execute(
+                "INSERT INTO matches (id, video_hash, created_at) VALUES (?, ?, ?)",
+                (match_id, video_hash, time.time()),
+            )
+            connection.executemany(
+                "INSERT INTO kill_events VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", kills
+            )
+            connection.executemany(
+                "INSERT INTO weapon_intervals VALUES (?, ?, ?, ?, ?)", intervals
+            )
+
+    def recent_matches(self, limit=None) -> List[str]:
+        """Ids of the stored matches, most recent first."""
+        query = "SELECT id FROM matches ORDER BY created_at DESC"
+        params = ()
+        if limit is not None:
+            query += " LIMIT ?"
+            params = (limit,)
+        with closing(self._connect()) as connection:
+            return [row["id"] for row in connection.execute(query, params)]
+
+    @staticmethod
+    def _filters(last_matches, **columns):
+        clauses, params = [], []
+        for column, value in columns.items():
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if last_matches is not None:
+            clauses.append(
+                "match_id IN (SELECT id FROM matches ORDER BY created_at DESC LIMIT ?)"
+            )
+            params.append(last_matches)
+
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        return where, params
+
+    def kill_stats(
+        self,
+        killer: Optional[str] = None,
+        weapon: Optional[str] = None,
+        killer_team: Optional[str] = None,
+        victim: Optional[str] = None,
+        last_matches: Optional[int] = None,
+    ) -> dict:
+        """
+        Kills, headshots and wallbangs matching the given filters.
+
+        E.g. kill_stats(killer="Jett", weapon="Vandal", last_matches=100) gives
+        Jett's Vandal headshot rate over the last 100 matches.
+        """
+        where, params = self._filters(
+            last_matches,
+            killer=killer,
+            weapon=weapon,
+            killer_team=killer_team,
+            victim=victim,
+        )
+        query = (
+            "SELECT COUNT(*) AS kills, COALESCE(SUM(is_headshot), 0) AS headshots,"
+            " COALESCE(SUM(is_wallbang), 0) AS wallbangs,"
+            " COUNT(DISTINCT match_id) AS matches"
+            f" FROM kill_events{where}"
+        )
+        with closing(self._connect()) as connection:
+            row = dict(connection.execute(query, params).fetchone())
+
+        row["headshot_rate"] = row["headshots"] / row["kills"] if row["kills"] else 0.0
+        return row
+
+    def deaths(self, victim: str, last_matches: Optional[int] = None) -> int:
+        """Number of times `victim` was killed."""
+        where, params = self._filters(last_matches, victim=victim)
+        with closing(self._connect()) as connection:
+            query = f"SELECT COUNT(*) FROM kill_events{where}"
+            return connection.execute(query, params).fetchone()[0]
+
+    def weapon_usage(
+        self, weapon: Optional[str] = None, last_matches: Optional[int] = None
+    ) -> dict:
+        """Seconds each weapon was held, as {weapon: seconds}."""
+        where, params = self._filters(last_matches, weapon=weapon)
+        query = (
+            "SELECT weapon, SUM(duration) AS seconds"
+            f" FROM weapon_intervals{where} GROUP BY weapon ORDER BY seconds DESC"
+        )
+        with closing(self._connect()) as connection:
+            return {
+                row["weapon"]: row["seconds"]
+                for row in connection.execute(query, params)
+            }
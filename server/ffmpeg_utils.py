@@ -0,0 +1,8 @@
+import imageio_ffmpeg
+
+from config import Config
+
+
+def ffmpeg_binary():
+    """Path of the ffmpeg executable, Config.FFMPEG_BINARY or moviepy's own."""
+    return Config.FFMPEG_BINARY or imageio_ffmpeg.get_ffmpeg_exe()
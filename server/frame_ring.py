@@ -0,0 +1,285 @@
+import multiprocessing
+import subprocess
+import sys
+import traceback
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Any, Callable, List
+
+import numpy as np
+
+from config import Config
+from frame_source import FrameConsumer
+from metrics import JobMetrics
+from roi_source import RoiFrameSource
+
+
+@dataclass
+class RingWorker:
+    """
+    A consumer that runs in its own process of a FrameRing run.
+
+    `make()` builds the consumer inside the worker process, so its model loads
+    there, and `collect(consumer)` is the result sent back once it finished.
+    Both are pickled: use module-level functions or partials of them.
+    """
+
+    make: Callable[[], FrameConsumer]
+    collect: Callable[[FrameConsumer], Any]
+
+
+class _Control:
+    """Slot bookkeeping shared by the decoder and the workers, under one lock."""
+
+    def __init__(self, context, slots, workers):
+        self.condition = context.Condition()
+        self.seqs = context.RawArray("q", [-1] * slots)  # sequence number in a slot
+        self.users = context.RawArray("q", slots)  # workers yet to release a slot
+        self.waiting = context.RawArray("b", workers)  # worker waits for a frame
+        self.published = context.RawValue("q", 0)  # sequence numbers written
+        self.done = context.RawValue("b", 0)
+        self.failed = context.RawValue("b", 0)
+
+    def free_slot(self):
+        for slot, users in enumerate(self.users):
+            if not users:
+                return slot
+        return None
+
+    def slot_of(self, seq):
+        return list(self.seqs).index(seq)
+
+    def release(self, slots):
+        with self.condition:
+            for slot in slots:
+                self.users[slot] -= 1
+            self.condition.notify_all()
+
+
+def _run_worker(index, worker, info, every, control, conn):
+    """Process entry point: run one consumer over the slots in sequence order."""
+    shm = None
+    try:
+        consumer = worker.make()
+        roi = consumer.roi(info)
+        conn.send(("roi", roi))
+        setup = conn.recv()
+        if setup is None:
+            return
+
+        name, shape, offset = setup
+        shm = shared_memory.SharedMemory(name=name)
+        size = int(np.prod(shape))
+        slots = [
+            np.ndarray(shape, np.uint8, buffer=shm.buf, offset=slot * size)
+            for slot in range(len(control.users))
+        ]
+        width, height = roi.output_size
+
+        consumer.start(info)
+        held = []
+        seq = 0
+        while True:
+            with control.condition:
+                control.waiting[index] = 1
+                while control.published.value <= seq and not control.done.value:
+                    control.condition.wait()
+                control.waiting[index] = 0
+                if control.published.value <= seq:
+                    break
+                slot = control.slot_of(seq)
+
+            frame_index = seq * every
+            if consumer.wants(frame_index):
+                crop = slots[slot][offset : offset + height, :width]
+                consumer.consume_roi(crop, frame_index, frame_index / info.fps)
+                del crop
+            held.append(slot)
+
+            # A slot is free once no crop of it is referenced any more, e.g.
+            # after the batch it waited in ran; the list and getrefcount hold two
+            free = [slot for slot in held if sys.getrefcount(slots[slot]) <= 2]
+            if free:
+                held = [slot for slot in held if slot not in free]
+                control.release(free)
+            seq += 1
+
+        consumer.finish()
+        control.release(held)
+        conn.send(("result", worker.collect(consumer)))
+    except Exception:
+        with control.condition:
+            control.failed.value = 1
+            control.condition.notify_all()
+        conn.send(("error", traceback.format_exc()))
+    finally:
+        slots = held = consumer = None
+        if shm is not None:
+            try:
+                shm.close()
+            except BufferError:
+                pass  # views kept alive by a traceback; the process is exiting
+
+
+class FrameRing:
+    """
+    Decode ROI crops in this process and analyze them in worker processes.
+
+    ffmpeg crops every consumer's region out of one frame in `every`, as in
+    RoiFrameSource, and each stacked image is read straight from its pipe into
+    one of `slots` slots in shared memory. Every worker runs one consumer and
+    sees every slot in sequence-number order, through views of the slot, so a
+    crop is never copied or pickled. A slot is reused once every worker has
+    released it; a worker keeps a slot while any of its crops is referenced,
+    as InferenceBatcher does until the batch runs. Decoding waits while every
+    slot is in use.
+
+    Consumers get the same crops and timestamps as in a RoiFrameSource run, so
+    the results are identical; since the consumers of one video keep state,
+    parallelism is one worker per consumer.
+    """
+
+    def __init__(self, video_path, every=1, slots=Config.RING_SLOTS, metrics=None):
+        self.video_path = video_path
+        self.every = max(1, int(every))
+        self.slots = slots
+        self.metrics = metrics or JobMetrics(enabled=False)
+        self.frames_delivered = 0
+
+    @staticmethod
+    def _receive(conn, kind):
+        try:
+            message, payload = conn.recv()
+        except EOFError:
+            raise RuntimeError("Frame ring worker exited unexpectedly") from None
+        if message == "error":
+            raise RuntimeError(f"Frame ring worker failed:\n{payload}")
+        assert message == kind
+        return payload
+
+    def _wait_for_slot(self, control, processes):
+        with control.condition:
+            while (slot := control.free_slot()) is None:
+                if control.failed.value:
+                    return None
+                if not all(process.is_alive() for process in processes):
+                    raise RuntimeError("Frame ring worker exited unexpectedly")
+                if all(control.waiting):
+                    raise RuntimeError(
+                        f"Workers hold all {self.slots} slots of the frame ring; "
+                        "use more slots than crops they batch"
+                    )
+                control.condition.wait(0.5)
+        return slot
+
+    def _decode(self, source, command, slots, control, processes, info, progress):
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, bufsize=0)
+        seq = 0
+        finished = False
+        try:
+            while True:
+                if progress:
+                    progress(seq * self.every, info.frame_count)
+
+                with self.metrics.stage("ring_wait"):
+                    slot = self._wait_for_slot(control, processes)
+                if slot is None:
+                    break
+
+                with self.metrics.stage("decode"):
+                    if not source.read_into(process.stdout, slots[slot]):
+                        finished = True
+                        break
+                self.metrics.count("frames_decoded", self.every)
+
+                with control.condition:
+                    control.seqs[slot] = seq
+                    control.users[slot] = len(processes)
+                    control.published.value = seq + 1
+                    control.condition.notify_all()
+                self.frames_delivered += 1
+                seq += 1
+        finally:
+            with control.condition:
+                control.done.value = 1
+                control.condition.notify_all()
+            process.stdout.close()
+            if not finished:
+                process.kill()
+            returncode = process.wait()
+
+        if finished and returncode != 0:
+            raise RuntimeError(
+                f"ffmpeg exited with {returncode} decoding {self.video_path}"
+            )
+
+    def run(self, workers: List[RingWorker], progress=None) -> list:
+        """Run the workers over the video and return what each collected."""
+        source = RoiFrameSource(self.video_path, every=self.every)
+        info = source.probe()
+        if info.fps <= 0:
+            raise FileNotFoundError(f"Could not open video: {self.video_path}")
+
+        context = multiprocessing.get_context("spawn")
+        control = _Control(context, self.slots, len(workers))
+        conns, processes = [], []
+        for index, worker in enumerate(workers):
+            conn, child_conn = context.Pipe()
+            process = context.Process(
+                target=_run_worker,
+                args=(index, worker, info, self.every, control, child_conn),
+                daemon=True,
+            )
+            process.start()
+            child_conn.close()
+            conns.append(conn)
+            processes.append(process)
+
+        shm = None
+        try:
+            rois = [self._receive(conn, "roi") for conn in conns]
+            if any(roi is None for roi in rois):
+                raise ValueError("Every frame ring consumer needs a roi")
+
+            offsets, shape = RoiFrameSource.layout(rois)
+            shm = shared_memory.SharedMemory(
+                create=True, size=int(np.prod(shape)) * self.slots
+            )
+            size = int(np.prod(shape))
+            slots = [
+                np.ndarray(shape, np.uint8, buffer=shm.buf, offset=slot * size)
+                for slot in range(self.slots)
+            ]
+            for conn, offset in zip(conns, offsets):
+                conn.send((shm.name, shape, offset))
+
+            self._decode(
+                source,
+                source.command(rois, shape),
+                slots,
+                control,
+                processes,
+                info,
+                progress,
+            )
+            results = [self._receive(conn, "result") for conn in conns]
+        finally:
+            slots = None
+            for conn in conns:
+                if shm is None and not conn.closed:
+                    try:
+                        conn.send(None)
+                    except OSError:
+                        pass
+            for process in processes:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+
+        if progress:
+            progress(info.frame_count, info.frame_count)
+
+        return results
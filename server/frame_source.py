@@ -0,0 +1,247 @@
+import cv2
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from metrics import JobMetrics
+
+
+@dataclass
+class VideoInfo:
+    fps: float
+    width: int
+    height: int
+    frame_count: int
+
+    @property
+    def duration(self) -> float:
+        """Total duration of the video in seconds."""
+        if self.fps > 0:
+            return self.frame_count / self.fps
+        return 0
+
+
+@dataclass(frozen=True)
+class Roi:
+    """
+    Region of a frame an analyzer looks at.
+
+    The box at `x`, `y` of `width` x `height` source pixels, scaled to `size`
+    (width, height) when given.
+    """
+
+    x: int
+    y: int
+    width: int
+    height: int
+    size: Optional[Tuple[int, int]] = None
+
+    @property
+    def output_size(self) -> Tuple[int, int]:
+        return self.size or (self.width, self.height)
+
+
+class FrameConsumer:
+    """
+    Base class for analyzers fed by a FrameSource.
+
+    Each consumer keeps its own sampling rate: the source asks `wants` for every
+    frame index and only hands over the frames the consumer asked for.
+    """
+
+    def start(self, info: VideoInfo):
+        """Called once before the first frame is delivered."""
+        self.info = info
+
+    def wants(self, frame_index: int) -> bool:
+        """Return True if this consumer needs the frame at `frame_index`."""
+        return False
+
+    def next_wanted(self, frame_index: int) -> Optional[int]:
+        """
+        Return the first frame index >= `frame_index` this consumer wants, or None.
+
+        Only used by the seek mode of FrameSource.run; subclasses with a regular
+        sampling pattern should override it with a closed form.
+        """
+        return frame_index if self.wants(frame_index) else frame_index + 1
+
+    def seek(self, frame_index: int):
+        """
+        Called after `start` when decoding begins at `frame_index` instead of 0.
+
+        Consumers with a sampling grid should move to the first sample at or after
+        `frame_index`, so a run over part of a video samples the same frames as a
+        run over all of it.
+        """
+
+    def roi(self, info: VideoInfo) -> Optional[Roi]:
+        """
+        The region of the frame this consumer looks at, or None for whole frames.
+
+        Sources that decode only regions, like RoiFrameSource, hand it to
+        `consume_roi` already cropped and scaled instead of calling `consume`.
+        """
+        return None
+
+    def consume(self, frame, frame_index: int, timestamp: float):
+        """Process a decoded frame. `timestamp` is the decoder position in seconds."""
+
+    def consume_roi(self, crop, frame_index: int, timestamp: float):
+        """Process the `roi` region of a frame, as `consume` does with the frame."""
+        raise NotImplementedError
+
+    def finish(self):
+        """Called once after the last frame has been delivered."""
+
+    def state(self):
+        """
+        Everything needed to carry on from the current frame, for a checkpoint.
+
+        Work queued for later, such as crops waiting for a batch, is finished
+        first. The state must be picklable.
+        """
+        raise NotImplementedError(f"{type(self).__name__} cannot be checkpointed")
+
+    def restore(self, state):
+        """Called after `start`, instead of `seek`, with a `state()` to resume."""
+        raise NotImplementedError(f"{type(self).__name__} cannot be checkpointed")
+
+
+class FrameSource:
+    """
+    Decode a video once and fan every frame out to a list of consumers.
+
+    Consumers are called in list order for each frame, so a consumer that reacts
+    to another consumer's output must come after it.
+
+    Frames that no consumer wants are grabbed but never retrieved, which skips the
+    colour conversion and copy of a full frame. With `seek` enabled, gaps longer
+    than `seek_threshold` frames are skipped with a keyframe seek instead, which
+    is only worth it for very low sampling rates.
+
+    Decode time and frame counts go to `metrics` when given.
+    """
+
+    def __init__(self, video_path, seek=False, seek_threshold=300, metrics=None):
+        self.video_path = video_path
+        self.seek = seek
+        self.seek_threshold = seek_threshold
+        self.metrics = metrics or JobMetrics(enabled=False)
+
+    def probe(self) -> VideoInfo:
+        """Read the stream properties without decoding any frame."""
+        cap = cv2.VideoCapture(self.video_path)
+        try:
+            return self._read_info(cap)
+        finally:
+            cap.release()
+
+    @staticmethod
+    def _read_info(cap) -> VideoInfo:
+        return VideoInfo(
+            fps=cap.get(cv2.CAP_PROP_FPS),
+            width=int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            height=int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            frame_count=int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+        )
+
+    def run(
+        self,
+        consumers: List[FrameConsumer],
+        progress=None,
+        start_frame=0,
+        end_frame=None,
+        checkpoint=None,
+    ) -> VideoInfo:
+        """
+        Decode the video, dispatching each frame to interested consumers.
+
+        Only frames in [`start_frame`, `end_frame`) are decoded; by default the
+        whole video. `progress(frames_processed, frames_total)` is called as the
+        position advances.
+
+        With a `checkpoint`, the position and the `state()` of every consumer are
+        saved periodically, and a run that finds a snapshot resumes from it. The
+        snapshot is removed once the run completes.
+        """
+        cap = cv2.VideoCapture(self.video_path)
+        if not cap.isOpened():
+            raise FileNotFoundError(f"Could not open video: {self.video_path}")
+
+        info = self._read_info(cap)
+        for consumer in consumers:
+            consumer.start(info)
+
+        frame_index = 0
+        resume = checkpoint.load() if checkpoint else None
+        if resume is not None:
+            frame_index, states = resume
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+            for consumer, state in zip(consumers, states):
+                consumer.restore(state)
+        elif start_frame > 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+            frame_index = start_frame
+            for consumer in consumers:
+                consumer.seek(start_frame)
+
+        try:
+            while end_frame is None or frame_index < end_frame:
+                if progress:
+                    progress(frame_index, info.frame_count)
+
+                if checkpoint and checkpoint.due():
+                    checkpoint.save(frame_index, [c.state() for c in consumers])
+
+                due = [c for c in consumers if c.wants(frame_index)]
+
+                if not due and self.seek:
+                    target = self._next_wanted(consumers, frame_index)
+                    if target is None:
+                        break
+                    if target - frame_index > self.seek_threshold:
+                        cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+                        frame_index = target
+                        continue
+
+                if not due:
+                    # Advance the decoder without retrieving the frame
+                    with self.metrics.stage("decode"):
+                        ret = cap.grab()
+                    if not ret:
+                        break
+                    self.metrics.count("frames_decoded")
+                    frame_index += 1
+                    continue
+
+                with self.metrics.stage("decode"):
+                    ret, frame = cap.read()
+                if not ret:
+                    break
+                self.metrics.count("frames_decoded")
+                self.metrics.count("frames_sampled")
+
+                timestamp = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000  # ms to seconds
+                for consumer in due:
+                    consumer.consume(frame, frame_index, timestamp)
+
+                frame_index += 1
+        finally:
+            cap.release()
+
+        if progress:
+            progress(frame_index, info.frame_count)
+
+        for consumer in consumers:
+            consumer.finish()
+
+        if checkpoint:
+            checkpoint.clear()
+
+        return info
+
+    @staticmethod
+    def _next_wanted(consumers, frame_index):
+        targets = [c.next_wanted(frame_index) for c in consumers]
+        targets = [t for t in targets if t is not None]
+        return min(targets) if targets else None
@@ -1,6 +1,15 @@
+import bisect
 import os
+import subprocess
+import tempfile
+import time
+
 import pandas as pd
-from moviepy import VideoFileClip, concatenate_videoclips
+from moviepy import VideoFileClip, concatenate_videoclips, vfx
+
+from config import Config
+from ffmpeg_utils import ffmpeg_binary
+from metrics import JobMetrics
 
 
 def validate_file_paths(csv_file, video_file):
@@ -24,32 +33,83 @@ def get_team_timestamps(csv_file, agent_name, team="green"):
 
         # Filter timestamps where the agent is the killer in the specified team
         mask = (df["killer_team"] == team) & (df["killer"] == agent_name)
-        timestamps = sorted(df[mask]["timestamp"].tolist())
+        return merge_ranges(df[mask]["timestamp"].tolist())
+    except Exception as e:
+        raise Exception(f"Error processing CSV file: {str(e)}")
 
-        # Merge overlapping timestamps (-3 to +3 sec range)
-        merged_timestamps = []
-        if timestamps:
-            start = max(0, timestamps[0] - 3)
-            end = timestamps[0] + 3
 
-            for t in timestamps[1:]:
-                if t - 3 <= end:
-                    end = t + 3
-                else:
-                    merged_timestamps.append((start, end))
-                    start = max(0, t - 3)
-                    end = t + 3
+def merge_ranges(timestamps, padding=3):
+    """Turn kill timestamps into sorted, merged (start, end) ranges of +-padding."""
+    merged_timestamps = []
+    for t in sorted(timestamps):
+        if merged_timestamps and t - padding <= merged_timestamps[-1][1]:
+            merged_timestamps[-1] = (merged_timestamps[-1][0], t + padding)
+        else:
+            merged_timestamps.append((max(0, t - padding), t + padding))
 
-            merged_timestamps.append((start, end))
+    return merged_timestamps
 
-        return merged_timestamps
-    except Exception as e:
-        raise Exception(f"Error processing CSV file: {str(e)}")
 
+def player_key(team, agent_name):
+    """Name a player the way the scoreboard does, e.g. "green_Kayo"."""
+    return team + "_" + agent_name
+
+
+def get_player_ranges(events, padding=3):
+    """Highlight ranges of every killer in `events`, keyed by player_key."""
+    timestamps = {}
+    for event in events:
+        key = player_key(event.killer_team, event.killer)
+        timestamps.setdefault(key, []).append(event.timestamp)
+
+    return {key: merge_ranges(times, padding) for key, times in timestamps.items()}
+
+
+def create_highlight_video(
+    video_path,
+    timestamp_ranges,
+    transition_duration=1,
+    stream_copy=False,
+    output_path=None,
+    metrics=None,
+):
+    """
+    Create a highlight video using the provided timestamp ranges.
+
+    By default the clips are joined with crossfades and re-encoded. With
+    `stream_copy` they are cut on keyframes and joined without re-encoding,
+    see stream_copy_highlight. Returns a message with the render time, which
+    is also recorded as the highlight_render stage of `metrics`.
+    """
+    output_path = output_path or os.path.join(
+        Config.HIGHLIGHT_FOLDER, "highlight_reel.mp4"
+    )
+    started = time.perf_counter()
+
+    if stream_copy:
+        stream_copy_highlight(video_path, timestamp_ranges, output_path)
+        mode = "stream copy"
+    else:
+        render_highlight_video(
+            video_path, timestamp_ranges, output_path, transition_duration
+        )
+        mode = "re-encoded"
+
+    render_time = time.perf_counter() - started
+    if metrics is not None:
+        metrics.add_time("highlight_render", render_time)
+    print(f"Highlight reel rendered in {render_time:.2f}s ({mode})")
+    return (
+        f"Highlight video created successfully at {output_path} "
+        f"in {render_time:.1f}s ({mode})"
+    )
 
-def create_highlight_video(video_path, timestamp_ranges, transition_duration=1):
+
+def render_highlight_video(
+    video_path, timestamp_ranges, output_path, transition_duration=1
+):
     """
-    Create a highlight video using the provided timestamp ranges, with transitions between clips.
+    Re-encode the clips with crossfades between them.
     """
     video = None
     final_video = None
@@ -58,10 +118,7 @@ def create_highlight_video(video_path, timestamp_ranges, transition_duration=1):
         # Use absolute path
         video_path = os.path.abspath(video_path)
 
-        # VideoFileClip with specific ffmpeg_params for better compatibility
-        video = VideoFileClip(
-            video_path, audio=True, ffmpeg_params=["-hwaccel", "auto", "-i", video_path]
-        )
+        video = VideoFileClip(video_path, audio=True)
 
         if not timestamp_ranges:
             raise ValueError("No timestamp ranges provided")
@@ -72,21 +129,17 @@ def create_highlight_video(video_path, timestamp_ranges, transition_duration=1):
             if end_time <= start_time:
                 continue
 
-            clip = video.subclip(start_time, end_time)
+            clip = video.subclipped(start_time, end_time)
             if clips:
-                clip = clip.crossfadein(
-                    min(transition_duration, (end_time - start_time) / 2)
-                )
+                fade = min(transition_duration, (end_time - start_time) / 2)
+                clip = clip.with_effects([vfx.CrossFadeIn(fade)])
             clips.append(clip)
 
         if not clips:
             raise ValueError("No valid clips generated")
 
         # Create output directory if it doesn't exist
-        output_dir = "highlights"
-        os.makedirs(output_dir, exist_ok=True)
-
-        output_path = os.path.join(output_dir, "highlight_reel.mp4")
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
 
         final_video = concatenate_videoclips(clips, method="compose")
         final_video.write_videofile(
@@ -98,8 +151,6 @@ def create_highlight_video(video_path, timestamp_ranges, transition_duration=1):
             preset="medium",
         )
 
-        return f"Highlight video created successfully at {output_path}"
-
     except Exception as e:
         raise Exception(f"Error creating highlight video: {str(e)}")
 
@@ -111,6 +162,190 @@ def create_highlight_video(video_path, timestamp_ranges, transition_duration=1):
             video.close()
 
 
+def keyframe_times(video_path):
+    """
+    Presentation times in seconds of the video keyframes, from the first frame.
+
+    Packets are only demuxed, not decoded, so this costs one read of the file.
+    """
+    command = [ffmpeg_binary(), "-hide_banner", "-loglevel", "error"]
+    command += ["-i", video_path, "-map", "0:v:0", "-c", "copy", "-f", "framecrc", "-"]
+    output = subprocess.run(command, capture_output=True, text=True, check=True)
+
+    time_base = None
+    times = []
+    for line in output.stdout.splitlines():
+        if line.startswith("#tb 0:"):
+            num, den = line.split(":", 1)[1].strip().split("/")
+            time_base = int(num) / int(den)
+            continue
+        if line.startswith("#") or time_base is None:
+            continue
+
+        # stream, dts, pts, duration, size, hash[, F=flags when not just "key"]
+        fields = [field.strip() for field in line.split(",")]
+        flags = int(fields[6][2:], 16) if len(fields) > 6 else 1
+        if flags & 1:
+            times.append(int(fields[2]) * time_base)
+
+    if not times:
+        return [0.0]
+    first = min(times)
+    return sorted(t - first for t in times)
+
+
+def stream_copy_highlight(video_path, timestamp_ranges, output_path):
+    """
+    Cut the ranges on keyframe boundaries and concatenate them by stream copy.
+
+    Each range starts at the last keyframe at or before it, so it can be copied
+    without re-encoding; ranges that overlap after that are merged. ffmpeg
+    streams the packets, so memory use does not depend on the reel length.
+    Clips are joined with hard cuts.
+    """
+    if not timestamp_ranges:
+        raise ValueError("No timestamp ranges provided")
+
+    stream_copy_highlights(video_path, {output_path: timestamp_ranges})
+    return output_path
+
+
+def stream_copy_highlights(video_path, reels):
+    """
+    Cut several reels by stream copy, reading the video only once.
+
+    `reels` maps each output path to its timestamp ranges, which are moved to
+    keyframes and merged as in stream_copy_highlight. A single ffmpeg call
+    writes every clip of every reel, each clip an output of its own, and each
+    reel is then concatenated from its clips.
+    """
+    keyframes = keyframe_times(video_path)
+    snapped = {}
+    for output_path, timestamp_ranges in reels.items():
+        if not timestamp_ranges:
+            raise ValueError(f"No timestamp ranges provided for {output_path}")
+
+        ranges = []
+        for start_time, end_time in sorted(timestamp_ranges):
+            start = bisect.bisect_right(keyframes, start_time)
+            start_time = keyframes[start - 1] if start else 0.0
+            if ranges and start_time <= ranges[-1][1]:
+                ranges[-1] = (ranges[-1][0], max(ranges[-1][1], end_time))
+            else:
+                ranges.append((start_time, end_time))
+        snapped[output_path] = ranges
+
+    ffmpeg = [ffmpeg_binary(), "-hide_banner", "-loglevel", "error", "-y"]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # Reels of different players may share a clip
+        clips = sorted({clip for ranges in snapped.values() for clip in ranges})
+        parts = {}
+        command = ffmpeg + ["-i", video_path]
+        for index, (start_time, end_time) in enumerate(clips):
+            part = parts[start_time, end_time] = os.path.join(
+                workdir, f"part_{index}.mp4"
+            )
+            command += ["-map", "0:v:0", "-map", "0:a:0?", "-c", "copy"]
+            # Output seeking with copy drops packets up to the first keyframe
+            # whose decode time is past the seek point, which can be a little
+            # before its presentation time; seek halfway from the keyframe
+            # before so this one is always the first kept
+            start = bisect.bisect_left(keyframes, start_time)
+            if start:
+                seek = (keyframes[start - 1] + start_time) / 2
+                command += ["-ss", f"{seek:.3f}"]
+            command += ["-to", f"{end_time:.3f}"]
+            command += ["-avoid_negative_ts", "make_zero", part]
+        subprocess.run(command, check=True)
+
+        for index, (output_path, ranges) in enumerate(snapped.items()):
+            concat_list = os.path.join(workdir, f"reel_{index}.txt")
+            with open(concat_list, "w") as f:
+                f.writelines(f"file '{parts[clip]}'\n" for clip in ranges)
+
+            # Written next to the reel and renamed, so a reel on disk is complete
+            os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+            root, extension = os.path.splitext(output_path)
+            part_path = f"{root}.part{extension}"
+            subprocess.run(
+                ffmpeg
+                + ["-f", "concat", "-safe", "0", "-i", concat_list, "-c", "copy"]
+                + ["-movflags", "+faststart", part_path],
+                check=True,
+            )
+            os.replace(part_path, output_path)
+
+
+def highlight_reels(events, output_dir, players=None, padding=3):
+    """
+    The reel of every killer in `events`, as {player: {"path", "ranges"}}.
+
+    Each reel is `<output_dir>/<team>_<agent>.mp4` with the ranges of
+    get_player_ranges. `players` limits this to a set of player_key names.
+    """
+    return {
+        key: {"path": os.path.join(output_dir, f"{key}.mp4"), "ranges": ranges}
+        for key, ranges in get_player_ranges(events, padding).items()
+        if players is None or key in players
+    }
+
+
+def get_highlights(
+    video_path,
+    events,
+    output_dir,
+    players=None,
+    padding=3,
+    metrics=None,
+    reuse=False,
+):
+    """
+    Cut the highlight_reels of `events` and return them.
+
+    All reels are cut by stream copy from one read of the video, see
+    stream_copy_highlights. Codecs MP4 cannot hold make that fail, and the
+    reels are then re-encoded one by one instead. A reel that cannot be made
+    either way gets its "error" and no "path"; the others are still returned.
+    With `reuse`, reels already in `output_dir` are kept instead of cut again.
+    The time taken is recorded as the highlight_render stage of `metrics`.
+    """
+    metrics = metrics or JobMetrics(enabled=False)
+    highlights = highlight_reels(events, output_dir, players, padding)
+    reels = {
+        key: reel
+        for key, reel in highlights.items()
+        if not (reuse and os.path.exists(reel["path"]))
+    }
+    if not reels:
+        return highlights
+
+    with metrics.stage("highlight_render"):
+        try:
+            stream_copy_highlights(
+                video_path, {reel["path"]: reel["ranges"] for reel in reels.values()}
+            )
+            return highlights
+        except (subprocess.CalledProcessError, OSError):
+            # ffmpeg has said why, e.g. a codec MP4 cannot hold
+            print("Warning: Stream copy of the highlight reels failed, re-encoding")
+
+        for key, reel in reels.items():
+            root, extension = os.path.splitext(reel["path"])
+            part_path = f"{root}.part{extension}"
+            try:
+                render_highlight_video(video_path, reel["ranges"], part_path)
+                os.replace(part_path, reel["path"])
+            except Exception as e:
+                print(f"Error creating highlight reel of {key}: {e}")
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+                reel["path"] = None
+                reel["error"] = str(e)
+
+    return highlights
+
+
 def get_highlight(csv_path, video_path, agent_name):
     """
     Main function to generate highlight video for a given agent in the green team.
@@ -127,7 +362,9 @@ def get_highlight(csv_path, video_path, agent_name):
             return "No highlights found for the specified agent."
 
         # Create highlight video
-        result = create_highlight_video(video_path, timestamp_ranges)
+        result = create_highlight_video(
+            video_path, timestamp_ranges, stream_copy=Config.HIGHLIGHT_STREAM_COPY
+        )
         return result
 
     except Exception as e:
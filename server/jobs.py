@@ -0,0 +1,144 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional
+
+from config import Config
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at its admission limit."""
+
+
+@dataclass
+class Job:
+    id: str
+    video_path: str
+    video_hash: Optional[str] = None
+    state: str = "queued"  # queued, running, done or failed
+    frames_total: int = 0
+    frames_processed: int = 0
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    live_scoreboard: Optional[object] = None  # ScoreboardAggregator while running
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def percent(self) -> float:
+        if self.state == "done":
+            return 100.0
+        if not self.frames_total:
+            return 0.0
+        return min(100.0, 100.0 * self.frames_processed / self.frames_total)
+
+    def update_progress(self, frames_processed, frames_total):
+        self.frames_processed = frames_processed
+        self.frames_total = frames_total
+
+    def status(self) -> dict:
+        return {
+            "id": self.id,
+            "state": self.state,
+            "percent": round(self.percent, 1),
+            "frames_processed": self.frames_processed,
+            "frames_total": self.frames_total,
+            "error": self.error,
+        }
+
+
+class JobQueue:
+    """
+    Run analysis jobs on a bounded pool of worker threads.
+
+    At most `workers` jobs run at once and at most `max_queued` wait for a
+    worker; submitting beyond that raises QueueFullError. Only the last
+    `history` finished jobs are remembered.
+    """
+
+    def __init__(
+        self,
+        target,
+        workers=Config.JOB_WORKERS,
+        max_queued=Config.JOB_QUEUE_SIZE,
+        history=Config.JOB_HISTORY,
+    ):
+        self.target = target
+        self.max_queued = max_queued
+        self.history = history
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+
+    def submit(self, video_path, video_hash=None, target=None) -> Job:
+        """
+        Queue `target(job)` for `video_path` and return the new job.
+
+        `target` defaults to the queue's own. While a job for the same
+        `video_hash` is queued or running, that job is returned instead, so one
+        video is never analysed twice at once.
+        """
+        with self.lock:
+            for job in self.jobs.values():
+                if video_hash and job.video_hash == video_hash:
+                    if job.state in ("queued", "running"):
+                        return job
+
+            queued = sum(1 for job in self.jobs.values() if job.state == "queued")
+            if queued >= self.max_queued:
+                raise QueueFullError(f"{queued} jobs already queued")
+
+            job = Job(id=uuid.uuid4().hex, video_path=video_path, video_hash=video_hash)
+            self.jobs[job.id] = job
+            self._prune()
+
+        self.executor.submit(self._run, job, target or self.target)
+        return job
+
+    def run(self, video_path, target, video_hash=None) -> Job:
+        """
+        Run `target(job)` in the calling thread and return the finished job.
+
+        For work quick enough to answer at once, e.g. a result from a cache. It
+        does not count against the queue's limits.
+        """
+        job = Job(id=uuid.uuid4().hex, video_path=video_path, video_hash=video_hash)
+        with self.lock:
+            self.jobs[job.id] = job
+
+        self._run(job, target)
+        with self.lock:
+            self._prune()
+
+        return job
+
+    def get(self, job_id) -> Optional[Job]:
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def _run(self, job, target):
+        job.state = "running"
+        job.started_at = time.time()
+        try:
+            job.result = target(job)
+            job.state = "done"
+        except Exception as e:
+            print(f"Job {job.id} failed: {e}")
+            job.error = str(e)
+            job.state = "failed"
+        finally:
+            job.finished_at = time.time()
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond the history limit."""
+        finished = [
+            job_id
+            for job_id, job in self.jobs.items()
+            if job.state in ("done", "failed")
+        ]
+        for job_id in finished[: max(0, len(finished) - self.history)]:
+            del self.jobs[job_id]
@@ -1,14 +1,22 @@
 import numpy as np
 from dataclasses import dataclass
 from typing import List, Optional, Tuple
-from ultralytics import YOLO
 import cv2
 import os
 import pandas as pd
 import math
-from color_detection import detect_majority_color
+from color_detection import team_color_classifier
+from frame_source import FrameConsumer, FrameSource, Roi
+from batching import InferenceBatcher
+from model_registry import get_model
+from config import Config
+from debug_artifacts import DebugArtifacts
+from metrics import JobMetrics
+from roi_source import RoiFrameSource
+from checkpoint import Checkpoint
 from constants import CHARACTER_CLASSES, WEAPON_CLASSES
 import json
+import threading
 
 
 
@@ -33,9 +41,17 @@ class KillEvent:
 
 
 class KillFeedParser:
-    def __init__(self, min_confidence: float = 0.5, max_horizontal_gap: float = 50):
+    def __init__(
+        self,
+        min_confidence: float = 0.5,
+        max_horizontal_gap: float = 50,
+        debug: Optional[DebugArtifacts] = None,
+        metrics: Optional[JobMetrics] = None,
+    ):
         self.min_confidence = min_confidence
         self.max_horizontal_gap = max_horizontal_gap
+        self.debug = debug or DebugArtifacts(enabled=False)
+        self.metrics = metrics or JobMetrics(enabled=False)
 
     def _filter_detections(self, detections: List[Detection]) -> List[Detection]:
         """Filter detections based on confidence threshold."""
@@ -66,8 +82,8 @@ class KillFeedParser:
         rows.append(sorted(current_row, key=lambda x: x.bbox[0]))
         return rows
 
-    def _parse_kill_row(self, frame, row: List[Detection]) -> Optional[KillEvent]:
-        """Parse a single row of detections into a kill event."""
+    def _split_row(self, row: List[Detection]):
+        """Split a row into characters, weapons, headshots and wallbangs, or None."""
         if len(row) < 3:  # Minimum: killer, weapon, victim
             print("\nInvalid row:", len(row), "\n")
             return None
@@ -83,24 +99,26 @@ class KillFeedParser:
             )
             return None
 
-        print("\nCharacters:", characters)
-        # The leftmost character is the killer
-        killer = characters[-2].class_name
-        victim = characters[-1].class_name
-        weapon = weapons[0].class_name
+        return characters, weapons, headshots, wallbangs
 
+    @staticmethod
+    def row_bbox(row: List[Detection]) -> Tuple[int, int, int, int]:
+        """Pixel box covering the whole row."""
         # get the xyxy coordinates of the whole row by taking the minimum x1 and maximum x2 of the row
         x1 = min([det.bbox[0] for det in row])
         y1 = min([det.bbox[1] for det in row])
         x2 = max([det.bbox[2] for det in row])
         y2 = max([det.bbox[3] for det in row])
+        return int(x1), int(y1), int(x2), int(y2)
 
-        # crop the row from the frame
-        row_frame = frame[int(y1) : int(y2), int(x1) : int(x2)]
-        cv2.imwrite("row_frame.jpg", row_frame)
+    def _build_event(self, parts, colors) -> KillEvent:
+        characters, weapons, headshots, wallbangs = parts
 
-        # get the team color of the killer and victim
-        colors = detect_majority_color(row_frame)
+        print("\nCharacters:", characters)
+        # The leftmost character is the killer
+        killer = characters[-2].class_name
+        victim = characters[-1].class_name
+        weapon = weapons[0].class_name
 
         assit = []
         for det in characters[:-2]:
@@ -118,24 +136,61 @@ class KillFeedParser:
             assist=assit,
         )
 
-    def parse_frame(
-        self, frame, detections: List[Detection], timestamp: float = 0.0
-    ) -> List[KillEvent]:
-        """Parse all kill events from a single frame."""
+    def _parse_kill_row(self, frame, row: List[Detection]) -> Optional[KillEvent]:
+        """Parse a single row of detections into a kill event."""
+        parts = self._split_row(row)
+        if parts is None:
+            return None
+
+        # get the team color of the killer and victim
+        colors = team_color_classifier.classify_rows(frame, [self.row_bbox(row)])
+        return self._build_event(parts, colors[0])
+
+    def valid_rows(self, detections: List[Detection]) -> List[Tuple[list, tuple]]:
+        """Group detections into rows and keep the (row, parts) that form a kill."""
+        with self.metrics.stage("row_grouping"):
+            return self._valid_rows(detections)
+
+    def _valid_rows(self, detections: List[Detection]) -> List[Tuple[list, tuple]]:
         filtered_dets = self._filter_detections(detections)
         # print("\nFiltered detections:", filtered_dets)
 
         rows = self._sort_detections_by_y_coordinate(filtered_dets)
         # print("\nSorted rows:", rows, len(rows))
 
-        kill_events = []
+        valid_rows = []
         for row in rows:
-            # print("\nRow:", row, len(row))
-            event = self._parse_kill_row(frame, row)
-            # print("\nEvent: \n", event)
-            if event:
-                event.timestamp = timestamp
-                kill_events.append(event)
+            parts = self._split_row(row)
+            if parts is not None:
+                valid_rows.append((row, parts))
+
+        return valid_rows
+
+    def parse_frame(
+        self, frame, detections: List[Detection], timestamp: float = 0.0
+    ) -> List[KillEvent]:
+        """Parse all kill events from a single frame."""
+        return self.build_events(frame, self.valid_rows(detections), timestamp)
+
+    def build_events(self, frame, valid_rows, timestamp: float = 0.0):
+        """Turn (row, parts) pairs from valid_rows into kill events."""
+        # get the team colors of every row in one pass over the frame
+        boxes = [self.row_bbox(row) for row, _ in valid_rows]
+        with self.metrics.stage("colour_detection"):
+            colors = team_color_classifier.classify_rows(frame, boxes)
+
+        kill_events = []
+        for index, ((row, parts), (x1, y1, x2, y2), row_colors) in enumerate(
+            zip(valid_rows, boxes, colors)
+        ):
+            # keep the row crop when debugging
+            self.debug.save(
+                "killfeed_rows", f"{timestamp:.2f}_{index}.jpg", frame[y1:y2, x1:x2]
+            )
+
+            event = self._build_event(parts, row_colors)
+            event.timestamp = timestamp
+            kill_events.append(event)
 
         return kill_events
 
@@ -144,8 +199,23 @@ class KillFeedParser:
 def process_video_frame(frame, yolo_model, timestamp):
     # Run YOLOv8 detection
     results = yolo_model(frame)
+    return parse_results(frame, results, timestamp)
 
-    # Convert YOLOv8 results to Detection objects
+
+def parse_results(frame, results, timestamp, debug=None):
+    """Parse kill events from the YOLO results of a single frame."""
+    detections = results_to_detections(results)
+
+    # Parse kill events
+    parser = KillFeedParser(debug=debug)
+    kill_events = parser.parse_frame(frame, detections, timestamp)
+    # print("Detected kill events:", kill_events)
+
+    return kill_events
+
+
+def results_to_detections(results) -> List[Detection]:
+    """Convert YOLOv8 results to Detection objects."""
     detections = []
     for result in results:
         for *xyxy, conf, cls in result.boxes.data:
@@ -156,12 +226,7 @@ def process_video_frame(frame, yolo_model, timestamp):
             )
             detections.append(det)
 
-    # Parse kill events
-    parser = KillFeedParser()
-    kill_events = parser.parse_frame(frame, detections, timestamp)
-    # print("Detected kill events:", kill_events)
-
-    return kill_events
+    return detections
 
 
 # def detect_and_extract_changes(
@@ -222,133 +287,579 @@ def process_video_frame(frame, yolo_model, timestamp):
 #     return result
 
 
+def crop_killfeed(frame, width, height):
+    """Crop the frame to the top right corner where the kill feed is drawn."""
+    return frame[
+        70 : height // 2,
+        math.floor(0.65 * width) : width,
+    ]
+
+
+# Bumped whenever the crops change detection and adaptive sampling skip change,
+# so results cached with the old logic are not served for the new one
+CHANGE_DETECTION_VERSION = 2
+
+
+class RoiChangeDetector:
+    """
+    Decide whether a kill feed crop differs from the last one that was inferred.
+
+    Crops are compared as small greyscale thumbnails, each pixel the mean of one
+    cell of a `size` grid over the crop. A crop counts as changed when any cell
+    differs by more than `threshold` grey levels: a new row covers only a few
+    cells, and a mean over the whole crop would hide it. At most `max_skip`
+    crops in a row are reported unchanged, and none when `force` is given.
+    """
+
+    def __init__(
+        self,
+        threshold=Config.KILL_FEED_CHANGE_THRESHOLD,
+        max_skip=Config.KILL_FEED_MAX_SKIP,
+        size=(32, 32),
+    ):
+        self.threshold = threshold
+        self.max_skip = max_skip
+        self.size = size
+        self.reference = None
+        self.skipped_in_row = 0
+
+    def changed(self, frame, force=False) -> bool:
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        thumbnail = cv2.resize(gray, self.size, interpolation=cv2.INTER_AREA)
+
+        if (
+            not force
+            and self.reference is not None
+            and self.skipped_in_row < self.max_skip
+            and cv2.absdiff(thumbnail, self.reference).max() <= self.threshold
+        ):
+            self.skipped_in_row += 1
+            return False
+
+        self.reference = thumbnail
+        self.skipped_in_row = 0
+        return True
+
+
+class AdaptiveSampler:
+    """
+    Choose which frames the kill feed consumer samples.
+
+    Without `max_latency` every `fps_target`-th second frame is sampled, as before.
+    With it, a frame is sampled every `max_latency` seconds while the kill feed is
+    empty, which bounds how late a new row is noticed. As soon as a row is seen
+    the full `fps_target` rate is used, until no row has been seen for
+    `quiet_period` seconds.
+    """
+
+    def __init__(
+        self,
+        fps_target,
+        max_latency=None,
+        quiet_period=Config.KILL_FEED_QUIET_PERIOD,
+    ):
+        self.fps_target = fps_target
+        self.max_latency = max_latency
+        self.quiet_period = quiet_period
+
+    def start(self, fps):
+        self.full_interval = max(1, int(fps / self.fps_target))
+        self.idle_interval = self.full_interval
+        if self.max_latency is not None:
+            self.idle_interval = max(self.full_interval, int(fps * self.max_latency))
+
+        self.active = self.max_latency is None
+        self.last_seen = None
+        self.last_frame = 0
+        self.next_frame = 0
+
+    @property
+    def interval(self):
+        return self.full_interval if self.active else self.idle_interval
+
+    def seek(self, frame_index):
+        """Resume on the fixed-rate sampling grid at or after `frame_index`."""
+        self.last_frame = frame_index
+        self.next_frame = -(-frame_index // self.full_interval) * self.full_interval
+
+    def wants(self, frame_index):
+        return frame_index >= self.next_frame
+
+    def next_wanted(self, frame_index):
+        return max(frame_index, self.next_frame)
+
+    def sampled(self, frame_index):
+        self.last_frame = frame_index
+        self.next_frame = frame_index + self.interval
+
+    def observe(self, timestamp, has_rows):
+        """Update the rate from the inference result of the sample at `timestamp`."""
+        if self.max_latency is None:
+            return
+
+        if has_rows:
+            self.last_seen = timestamp
+            if not self.active:
+                self.active = True
+                self.next_frame = min(
+                    self.next_frame, self.last_frame + self.full_interval
+                )
+        elif self.active and timestamp - self.last_seen >= self.quiet_period:
+            self.active = False
+
+
+def has_detections(results, min_confidence=0.5):
+    """Return True if any box in the YOLO results reaches `min_confidence`."""
+    return any(float(conf) >= min_confidence for r in results for conf in r.boxes.conf)
+
+
+@dataclass
+class TrackedRow:
+    signature: Tuple[str, ...]  # class names of the row's icons, left to right
+    bbox: Tuple[int, int, int, int]
+    first_seen: float
+    last_seen: float
+    event: Optional[KillEvent] = None
+
+
+def box_iou(a, b) -> float:
+    """Intersection over union of two (x1, y1, x2, y2) boxes."""
+    w = min(a[2], b[2]) - max(a[0], b[0])
+    h = min(a[3], b[3]) - max(a[1], b[1])
+    if w <= 0 or h <= 0:
+        return 0.0
+    inter = w * h
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union
+
+
+def span_iou(a, b) -> float:
+    """Intersection over union of the horizontal extents of two boxes."""
+    inter = min(a[2], b[2]) - max(a[0], b[0])
+    if inter <= 0:
+        return 0.0
+    return inter / (max(a[2], b[2]) - min(a[0], b[0]))
+
+
+class KillFeedRowTracker:
+    """
+    Follow kill feed rows across samples so each row is parsed only once.
+
+    A row continues a live track when it shows the same icons over the same
+    horizontal span, which covers rows sliding as the feed scrolls, or failing
+    that when it overlaps a track seen within `timeout` seconds by at least
+    `iou_threshold`, which covers an icon flickering in or out of the
+    detections. Tracks that have not been seen for `timeout` seconds, and for at
+    least two of the `sample_interval` seconds between samples, are dropped, so
+    the state only ever holds the rows currently on screen however sparse the
+    samples are.
+    """
+
+    def __init__(
+        self,
+        iou_threshold=0.5,
+        timeout=Config.KILL_FEED_TRACK_TIMEOUT,
+        sample_interval=0.0,
+    ):
+        self.iou_threshold = iou_threshold
+        self.timeout = timeout
+        self.sample_interval = sample_interval
+        self.tracks: List[TrackedRow] = []
+        self.visible: List[TrackedRow] = []  # tracks matched by the last update
+
+    def update(self, rows, timestamp) -> List[TrackedRow]:
+        """
+        Match (signature, bbox) rows seen at `timestamp` to tracks.
+
+        Returns one track per row; rows that start a new track get a track whose
+        `event` is still None.
+        """
+        self.expire(timestamp)
+        free = list(self.tracks)
+        matched = [None] * len(rows)
+
+        # Same icons first, so a new row taking the place of one that scrolled
+        # away is not mistaken for it
+        for same_icons in (True, False):
+            for i, (signature, bbox) in enumerate(rows):
+                if matched[i] is None:
+                    matched[i] = self._match(
+                        signature, bbox, free, same_icons, timestamp
+                    )
+                    if matched[i] is not None:
+                        free.remove(matched[i])
+
+        for i, (signature, bbox) in enumerate(rows):
+            track = matched[i]
+            if track is None:
+                track = matched[i] = TrackedRow(signature, bbox, timestamp, timestamp)
+                self.tracks.append(track)
+            track.bbox = bbox
+            track.last_seen = timestamp
+
+        self.visible = matched
+        return matched
+
+    def confirm(self, timestamp):
+        """Mark the rows of the last update as seen again, e.g. for unchanged crops."""
+        for track in self.visible:
+            track.last_seen = timestamp
+
+    def expire(self, timestamp):
+        # A row still on screen is seen again one sample later, however long
+        # that is; waiting for two tolerates one missed detection
+        timeout = max(self.timeout, 2 * self.sample_interval)
+        self.tracks = [
+            track for track in self.tracks if timestamp - track.last_seen <= timeout
+        ]
+
+    def _match(
+        self, signature, bbox, tracks, same_icons, timestamp
+    ) -> Optional[TrackedRow]:
+        """Closest track in `tracks` that `bbox` continues, or None."""
+        best, best_distance = None, None
+        for track in tracks:
+            if not same_icons and timestamp - track.last_seen > self.timeout:
+                # Across a longer gap other icons are another row in its place
+                continue
+            if same_icons:
+                same_row = (
+                    signature == track.signature
+                    and span_iou(bbox, track.bbox) >= self.iou_threshold
+                )
+            else:
+                same_row = box_iou(bbox, track.bbox) >= self.iou_threshold
+            distance = abs(bbox[1] - track.bbox[1])
+            if same_row and (best is None or distance < best_distance):
+                best, best_distance = track, distance
+
+        return best
+
+
+class KillFeedConsumer(FrameConsumer):
+    """
+    Sample the kill feed ROI at `fps_target` and collect one kill event per row.
+
+    Rows are followed across samples by a KillFeedRowTracker; a row is parsed and
+    colour-classified when it first appears and only confirmed afterwards.
+    With `max_latency` the rate adapts to the kill feed, see AdaptiveSampler.
+    When `change_threshold` is set, crops that look the same as the last inferred
+    crop skip YOLO and confirm the rows already on screen. With `max_latency`, a
+    crop is only skipped if the next sample is still within `max_latency` of the
+    last inferred crop, so a row the change detector misses is seen in time.
+    """
+
+    def __init__(
+        self,
+        yolo_model,
+        fps_target=5,
+        track_timeout=Config.KILL_FEED_TRACK_TIMEOUT,
+        batch_size=Config.INFERENCE_BATCH_SIZE,
+        max_wait=Config.INFERENCE_MAX_WAIT,
+        change_threshold=Config.KILL_FEED_CHANGE_THRESHOLD,
+        max_latency=None,
+        quiet_period=Config.KILL_FEED_QUIET_PERIOD,
+        debug=None,
+        metrics=None,
+    ):
+        self.fps_target = fps_target
+        self.metrics = metrics or JobMetrics(enabled=False)
+        self.tracker = KillFeedRowTracker(timeout=track_timeout)
+        self.parser = KillFeedParser(debug=debug, metrics=self.metrics)
+        self.sampler = AdaptiveSampler(fps_target, max_latency, quiet_period)
+        self.batcher = InferenceBatcher(
+            yolo_model,
+            self._handle_results,
+            batch_size,
+            max_wait,
+            metrics=self.metrics,
+            name="killfeed",
+        )
+        self.change_detector = (
+            RoiChangeDetector(change_threshold)
+            if change_threshold is not None
+            else None
+        )
+        self.last_has_rows = False
+        self.last_inferred = None  # timestamp of the last crop sent to YOLO
+        self.events = []
+        self.listeners = []
+        self.debug = debug or DebugArtifacts(enabled=False)
+
+    def add_listener(self, callback):
+        """Register `callback(event)` to be called for every new kill event."""
+        self.listeners.append(callback)
+
+    def start(self, info):
+        super().start(info)
+        self.sampler.start(info.fps)
+        if info.fps:
+            self.tracker.sample_interval = self.sampler.full_interval / info.fps
+
+    def seek(self, frame_index):
+        self.sampler.seek(frame_index)
+
+    @property
+    def fixed_rate_samples(self):
+        """Samples a fixed `fps_target` run takes over the whole video."""
+        return -(-self.info.frame_count // self.sampler.full_interval)
+
+    def wants(self, frame_index):
+        return self.sampler.wants(frame_index)
+
+    def next_wanted(self, frame_index):
+        return self.sampler.next_wanted(frame_index)
+
+    def roi(self, info):
+        # The region crop_killfeed takes
+        x = math.floor(0.65 * info.width)
+        return Roi(x=x, y=70, width=info.width - x, height=info.height // 2 - 70)
+
+    def consume(self, frame, frame_index, timestamp):
+        with self.metrics.stage("killfeed_crop"):
+            cropped_frame = crop_killfeed(frame, self.info.width, self.info.height)
+        self.consume_roi(cropped_frame, frame_index, timestamp)
+
+    def consume_roi(self, cropped_frame, frame_index, timestamp):
+        self.sampler.sampled(frame_index)
+
+        self.debug.save("killfeed_crops", f"{timestamp:.2f}.jpg", cropped_frame)
+
+        infer = True
+        if self.change_detector is not None:
+            with self.metrics.stage("change_detection"):
+                infer = self.change_detector.changed(
+                    cropped_frame, force=self._latency_due(timestamp)
+                )
+        if infer:
+            self.last_inferred = timestamp
+        self.batcher.submit(cropped_frame, timestamp, infer=infer)
+
+        # Idle samples are sparse, so do not let them wait for a full batch
+        # before the sampler learns whether the kill feed is busy
+        if not self.sampler.active:
+            self.batcher.flush()
+
+    def _latency_due(self, timestamp):
+        """Whether skipping this crop could leave a new row unseen too long."""
+        max_latency = self.sampler.max_latency
+        if max_latency is None or self.last_inferred is None:
+            return False
+        next_sample = timestamp + self.sampler.interval / self.info.fps
+        return next_sample - self.last_inferred > max_latency
+
+    def finish(self):
+        self.batcher.flush()
+
+    def state(self):
+        self.batcher.flush()
+        return {
+            "sampler": dict(vars(self.sampler)),
+            "tracker": dict(vars(self.tracker)),
+            "change_detector": (
+                dict(vars(self.change_detector)) if self.change_detector else None
+            ),
+            "last_has_rows": self.last_has_rows,
+            "last_inferred": self.last_inferred,
+            "events": self.events,
+            "batcher": (
+                self.batcher.batches,
+                self.batcher.frames,
+                self.batcher.skipped,
+            ),
+        }
+
+    def restore(self, state):
+        self.sampler.__dict__.update(state["sampler"])
+        self.tracker.__dict__.update(state["tracker"])
+        if self.change_detector and state["change_detector"]:
+            self.change_detector.__dict__.update(state["change_detector"])
+        self.last_has_rows = state["last_has_rows"]
+        self.last_inferred = state["last_inferred"]
+        self.events = state["events"]
+        self.batcher.batches, self.batcher.frames, self.batcher.skipped = state[
+            "batcher"
+        ]
+
+        # Listeners hear of the events found before the resume again, so a
+        # scoreboard built from them matches an uninterrupted run
+        for event in self.events:
+            for callback in self.listeners:
+                callback(event)
+
+    @property
+    def frames_inferred(self):
+        return self.batcher.frames
+
+    @property
+    def frames_skipped(self):
+        return self.batcher.skipped
+
+    def _handle_results(self, cropped_frame, timestamp, results):
+        if results is None:
+            # Unchanged crop: the rows on screen are still the same
+            self.tracker.confirm(timestamp)
+            self.sampler.observe(timestamp, self.last_has_rows)
+            return
+
+        self.last_has_rows = has_detections(results)
+        self.sampler.observe(timestamp, self.last_has_rows)
+
+        valid_rows = self.parser.valid_rows(results_to_detections(results))
+        with self.metrics.stage("row_tracking"):
+            tracks = self.tracker.update(
+                [
+                    (tuple(det.class_name for det in row), self.parser.row_bbox(row))
+                    for row, _ in valid_rows
+                ],
+                timestamp,
+            )
+
+        # Only rows that just appeared are parsed into events
+        new = [
+            (row, track) for row, track in zip(valid_rows, tracks) if not track.event
+        ]
+        kill_events = self.parser.build_events(
+            cropped_frame, [row for row, _ in new], timestamp
+        )
+        self.metrics.count("rows_parsed", len(valid_rows))
+        self.metrics.count("events_emitted", len(kill_events))
+        for (_, track), event in zip(new, kill_events):
+            track.event = event
+            self.events.append(event)
+            for callback in self.listeners:
+                callback(event)
+
+
 def get_kill_events(
     video_path,
     model_path,
     output_folder="frames_output",
     fps_target=5,
     output_csv="killfeed_data.csv",
-    deduplication_window=5.1,  # Time window (in seconds) to filter duplicates
+    track_timeout=Config.KILL_FEED_TRACK_TIMEOUT,  # Seconds a row may go unseen
+    seek=False,  # Jump between sampled frames with keyframe seeks (low fps_target)
+    change_threshold=Config.KILL_FEED_CHANGE_THRESHOLD,  # None infers every sample
+    max_latency=None,  # Sample adaptively, noticing new rows within this many seconds
+    debug=None,  # DebugArtifacts that keeps sampled crops and rows
+    metrics=None,  # JobMetrics that records stage timings and counts
+    roi_decode=Config.ROI_DECODE,  # Only decode the kill feed region, with ffmpeg
+    checkpoint_path=None,  # Resume from and periodically save progress to this file
 ):
+    if roi_decode and checkpoint_path:
+        raise ValueError("roi_decode runs cannot be checkpointed")
+
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
 
-    cap = cv2.VideoCapture(video_path)
-    original_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    original_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    frame_interval = int(fps / fps_target)
-    frame_count = 0
-    result = []
-
-    recent_events = {}  # Dictionary to track recent kill events
-
-    yolo_model = YOLO(model_path)
+    checkpoint = None
+    if checkpoint_path:
+        settings = dict(
+            model_path=model_path,
+            fps_target=fps_target,
+            track_timeout=track_timeout,
+            change_threshold=change_threshold,
+            max_latency=max_latency,
+            max_skip=Config.KILL_FEED_MAX_SKIP,
+            quiet_period=Config.KILL_FEED_QUIET_PERIOD,
+            change_detection_version=CHANGE_DETECTION_VERSION,
+        )
+        checkpoint = Checkpoint(checkpoint_path, video_path, settings)
+
+    consumer = KillFeedConsumer(
+        get_model(model_path),
+        fps_target=fps_target,
+        track_timeout=track_timeout,
+        change_threshold=change_threshold,
+        max_latency=max_latency,
+        debug=debug,
+        metrics=metrics,
+    )
+    if roi_decode:
+        # ffmpeg only hands over the kill feed region of every sampled frame
+        fps = FrameSource(video_path).probe().fps
+        every = max(1, int(fps / fps_target)) if fps > 0 else 1
+        RoiFrameSource(video_path, every=every, metrics=metrics).run([consumer])
+    else:
+        FrameSource(video_path, seek=seek, metrics=metrics).run(
+            [consumer], checkpoint=checkpoint
+        )
+    return consumer.events
 
-    while True:
-        ret, frame = cap.read()
 
-        if not ret:
-            break
+class ScoreboardAggregator:
+    """
+    Per-player stats updated one kill event at a time.
 
-        frame = cv2.resize(frame, (original_width, original_height))
+    `add` only touches the killer, the victim and the assisting players, so the
+    scoreboard can be read while a video is still being analysed. Reads and
+    updates may come from different threads; `wait` blocks until the next event.
+    """
 
-        if frame_count % frame_interval == 0:
-            # Crop the frame to the top right corner
-            cropped_frame = frame[
-                70 : original_height // 2,
-                math.floor(0.65 * original_width) : original_width,
-            ]
+    def __init__(self):
+        self.scoreboard = {}
+        self.events = 0
+        self.condition = threading.Condition()
 
-            ## only for testing
-            frame_filename = "temp_frame_cropped.jpg"
-            cv2.imwrite(frame_filename, cropped_frame)
+    def _player(self, name, team, weapon=None):
+        key = team + "_" + name
+        player = self.scoreboard.get(key)
+        if player is None:
+            player = self.scoreboard[key] = {
+                "kills": 0,
+                "deaths": 0,
+                "assists": 0,
+                "headshots": 0,
+                "wallbangs": 0,
+                "team_color": team,
+                "weapon_used": weapon,
+                "kill_death_ratio": 0.0,
+            }
+        return player
 
-            timestamp = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000  # Convert ms to seconds
-            kill_events = process_video_frame(cropped_frame, yolo_model, timestamp)
+    def add(self, event: KillEvent):
+        with self.condition:
+            killer = self._player(event.killer, event.killer_team, event.weapon)
+            victim = self._player(event.victim, event.victim_team)
 
-            for event in kill_events:
-                # Create a unique key for deduplication (excluding timestamp)
-                event_key = (
-                    event.killer,
-                    event.killer_team,
-                    event.victim,
-                    event.victim_team,
-                    event.weapon,
-                    event.is_headshot,
-                    event.is_wallbang,
-                )
+            killer["kills"] += 1
+            victim["deaths"] += 1
+            killer["headshots"] += int(event.is_headshot)
+            killer["wallbangs"] += int(event.is_wallbang)
 
-                # Check if a similar event happened recently
-                if event_key in recent_events:
-                    last_time = recent_events[event_key]
-                    if timestamp - last_time <= deduplication_window:
-                        continue  # Skip duplicate within time window
+            for assist in event.assist or []:
+                self._player(assist, event.killer_team)["assists"] += 1
 
-                # Update recent events and keep track of its timestamp
-                recent_events[event_key] = timestamp
-                result.append(event)
+            for player in (killer, victim):
+                # Avoid division by zero
+                player["kill_death_ratio"] = player["kills"] / (player["deaths"] + 1)
 
-        frame_count += 1
+            self.events += 1
+            self.condition.notify_all()
 
-    cap.release()
-    return result
+    def snapshot(self) -> dict:
+        """Return a copy of the current scoreboard."""
+        with self.condition:
+            return {key: dict(player) for key, player in self.scoreboard.items()}
 
+    def wait(self, events_seen, timeout=None) -> int:
+        """Block until more than `events_seen` events were added; return the count."""
+        with self.condition:
+            self.condition.wait_for(lambda: self.events > events_seen, timeout)
+            return self.events
 
-def get_scoreboard(killEvents):
-    # create a dictionary to store the scoreboard
-    scoreboard = {}
 
+def build_scoreboard(killEvents):
+    """Aggregate kill events into per-player stats without writing any files."""
+    aggregator = ScoreboardAggregator()
     for event in killEvents:
-        killer = event.killer_team + "_" + event.killer
-        victim = event.victim_team + "_" + event.victim
+        aggregator.add(event)
 
-        if killer not in scoreboard:
-            scoreboard[killer] = {
-                "kills": 0,
-                "deaths": 0,
-                "assists": 0,
-                "headshots": 0,
-                "wallbangs": 0,
-                "team_color": event.killer_team,
-                "weapon_used": event.weapon,
-            }
+    return aggregator.scoreboard
 
-        if victim not in scoreboard:
-            scoreboard[victim] = {
-                "kills": 0,
-                "deaths": 0,
-                "assists": 0,
-                "headshots": 0,
-                "wallbangs": 0,
-                "team_color": event.victim_team,
-                "weapon_used": None,
-            }
 
-        scoreboard[killer]["kills"] += 1
-        scoreboard[victim]["deaths"] += 1
-        scoreboard[killer]["headshots"] += int(event.is_headshot)
-        scoreboard[killer]["wallbangs"] += int(event.is_wallbang)
-
-        for assit in event.assist:
-            assitPlayerName = event.killer_team + "_" + assit
-            if assitPlayerName not in scoreboard:
-                scoreboard[assitPlayerName] = {
-                    "kills": 0,
-                    "deaths": 0,
-                    "assists": 0,
-                    "headshots": 0,
-                    "wallbangs": 0,
-                    "team_color": event.killer_team,
-                    "weapon_used": None,
-                }
-            scoreboard[assitPlayerName]["assists"] += 1
-
-    for player in scoreboard:
-        scoreboard[player]["kill_death_ratio"] = scoreboard[player]["kills"] / (
-            scoreboard[player]["deaths"] + 1
-        )  # Avoid division by zero
+def get_scoreboard(killEvents):
+    scoreboard = build_scoreboard(killEvents)
 
     # print the scoreboard
     print(scoreboard)
@@ -357,17 +868,13 @@ def get_scoreboard(killEvents):
 
     with open("scoreboard.json", "w") as f:
         json.dump(scoreboard, f, indent=4)
-        
-        
-        
+
     df = pd.DataFrame(killEvents)
     df.to_csv("valorant_data.csv", index=False)
 
     return scoreboard
 
 
-
-
 if __name__ == "__main__":
     video_path = "videos/4k 3.mp4"
     model_path = "character_detector_100epoch.pt"
@@ -0,0 +1,339 @@
+"""
+Analyze a match while it is being recorded.
+
+Usage (from the server directory):
+    python live.py SOURCE [--follow] [--realtime] [--duration SECONDS]
+        [--metrics-port PORT]
+
+SOURCE is anything ffmpeg can read: a capture device, a URL, "-" for stdin or a
+file. --follow keeps reading a file that is still being written, and --realtime
+reads a finished file at its native rate to stand in for a capture source.
+--metrics-port serves /metrics, with the latency percentiles, while it runs.
+"""
+
+import argparse
+import bisect
+import queue
+import subprocess
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from config import Config
+from ffmpeg_utils import ffmpeg_binary
+from frame_source import VideoInfo
+from killlfeed import KillFeedConsumer
+from metrics import metrics_registry
+from model_registry import get_model
+from weapon_tracker import WeaponHudConsumer
+
+
+class LatencyRecorder:
+    """Keep the latest `window` latencies and report their percentiles."""
+
+    def __init__(self, window=Config.LIVE_LATENCY_WINDOW):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def record(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+            self.count += 1
+
+    def percentiles(self, points=(50, 90, 99)) -> dict:
+        """Latency percentiles in seconds over the window, plus its maximum."""
+        with self.lock:
+            samples = np.array(self.samples)
+
+        summary = {"count": self.count}
+        if len(samples) == 0:
+            return summary
+
+        for point, value in zip(points, np.percentile(samples, points)):
+            summary[f"p{point}"] = float(value)
+        summary["max"] = float(samples.max())
+        return summary
+
+
+class LiveFrameSource:
+    """
+    Decode a live or growing input with an ffmpeg subprocess and feed consumers.
+
+    ffmpeg resamples the input to `fps` and scales it to `frame_size`, so frame
+    indices advance with stream time. A reader thread keeps at most `queue_size`
+    frames; when the consumers fall behind, the oldest frames are dropped instead
+    of letting the delay grow. Consumers see the same FrameConsumer interface
+    as with FrameSource, with timestamps in seconds of stream time.
+    """
+
+    def __init__(
+        self,
+        source,
+        fps=Config.LIVE_FPS,
+        frame_size=Config.LIVE_FRAME_SIZE,
+        follow=False,
+        realtime=False,
+        queue_size=Config.LIVE_QUEUE_SIZE,
+    ):
+        self.source = source
+        self.fps = fps
+        self.width, self.height = frame_size
+        self.follow = follow
+        self.realtime = realtime
+        self.frames = queue.Queue(maxsize=max(1, queue_size))
+        self.stop_event = threading.Event()
+        self.process = None
+        self.frames_read = 0
+        self.frames_dropped = 0
+        self.frames_processed = 0
+        self._arrivals = deque(maxlen=int(fps * 60))  # (timestamp, arrival time)
+
+    def command(self):
+        command = [ffmpeg_binary(), "-hide_banner", "-loglevel", "error"]
+        if self.realtime:
+            command += ["-re"]
+        if self.follow:
+            command += ["-follow", "1"]
+        return command + [
+            "-i",
+            self.source,
+            "-an",
+            "-vf",
+            f"fps={self.fps},scale={self.width}:{self.height}",
+            "-f",
+            "rawvideo",
+            "-pix_fmt",
+            "bgr24",
+            "pipe:1",
+        ]
+
+    def stop(self):
+        """Stop reading; `run` returns once the frames already read are handled."""
+        self.stop_event.set()
+        if self.process is not None:
+            self.process.kill()
+
+    def arrival_time(self, timestamp):
+        """Monotonic time the first frame at or after `timestamp` was read."""
+        index = bisect.bisect_left(self._arrivals, (timestamp - 1e-6,))
+        if index == len(self._arrivals):
+            return None
+        return self._arrivals[index][1]
+
+    def _put(self, item):
+        while True:
+            try:
+                self.frames.put_nowait(item)
+                return
+            except queue.Full:
+                # Drop the oldest frame rather than fall behind the input
+                try:
+                    self.frames.get_nowait()
+                    self.frames_dropped += 1
+                except queue.Empty:
+                    pass
+
+    def _read(self, process):
+        frame_bytes = self.width * self.height * 3
+        try:
+            while not self.stop_event.is_set():
+                data = process.stdout.read(frame_bytes)
+                if len(data) < frame_bytes:
+                    break
+                frame = np.frombuffer(data, np.uint8).reshape(
+                    self.height, self.width, 3
+                )
+                self._put((self.frames_read, time.monotonic(), frame))
+                self.frames_read += 1
+        finally:
+            self._put(None)
+
+    def run(self, consumers) -> VideoInfo:
+        """Dispatch frames until the input ends or `stop` is called."""
+        info = VideoInfo(
+            fps=self.fps, width=self.width, height=self.height, frame_count=0
+        )
+        for consumer in consumers:
+            consumer.start(info)
+
+        process = self.process = subprocess.Popen(
+            self.command(), stdout=subprocess.PIPE, bufsize=self.width * self.height * 3
+        )
+        if self.stop_event.is_set():
+            process.kill()
+        reader = threading.Thread(target=self._read, args=(process,), daemon=True)
+        reader.start()
+
+        try:
+            while True:
+                item = self.frames.get()
+                if item is None:
+                    break
+
+                frame_index, arrival, frame = item
+                due = [c for c in consumers if c.wants(frame_index)]
+                if not due:
+                    continue
+
+                timestamp = frame_index / self.fps
+                self._arrivals.append((timestamp, arrival))
+                for consumer in due:
+                    consumer.consume(frame, frame_index, timestamp)
+                self.frames_processed += 1
+        finally:
+            self.stop_event.set()
+            process.kill()
+            process.wait()
+            reader.join()
+
+        # Consumers end their intervals at the duration read so far
+        info.frame_count = self.frames_read
+        for consumer in consumers:
+            consumer.finish()
+
+        return info
+
+
+def analyze_live(
+    source: LiveFrameSource,
+    on_kill=None,
+    on_weapon=None,
+    max_latency=Config.KILL_FEED_MAX_LATENCY,
+):
+    """
+    Run the kill feed and weapon analyzers on a live source until it ends.
+
+    `on_kill(event, latency)` and `on_weapon(weapon_name, timestamp, latency)`
+    are called as soon as a kill or weapon change is found, with the seconds
+    between reading the frame it was found in and reporting it, or None when
+    that frame is no longer known. The p50 and p95 latencies are published as
+    the live_latency_seconds gauge of metrics_registry while the source runs.
+    Returns the kill feed and weapon consumers and the LatencyRecorder.
+    """
+    latency = LatencyRecorder()
+
+    def latency_samples():
+        summary = latency.percentiles((50, 95))
+        return [
+            (f'{{quantile="{point / 100:g}"}}', summary[f"p{point}"])
+            for point in (50, 95)
+            if f"p{point}" in summary
+        ]
+
+    # Batches of one, so an event never waits for later frames
+    killfeed = KillFeedConsumer(
+        get_model(Config.KILL_FEED_MODEL_PATH),
+        fps_target=Config.KILL_FEED_FPS_TARGET,
+        batch_size=1,
+        max_latency=max_latency,
+    )
+    weapons = WeaponHudConsumer(get_model(Config.WEAPON_MODEL_PATH), batch_size=1)
+
+    def measure(timestamp):
+        arrival = source.arrival_time(timestamp)
+        seconds = time.monotonic() - arrival if arrival is not None else None
+        if seconds is not None:
+            latency.record(seconds)
+        return seconds
+
+    def kill_found(event):
+        seconds = measure(event.timestamp)
+        if on_kill:
+            on_kill(event, seconds)
+
+    def weapon_changed(weapon_name, timestamp):
+        seconds = measure(timestamp)
+        if on_weapon:
+            on_weapon(weapon_name, timestamp, seconds)
+
+    killfeed.add_listener(kill_found)
+    weapons.add_listener(weapon_changed)
+
+    metrics_registry.add_gauge(
+        "live_latency_seconds",
+        "Seconds from reading a live frame to reporting its event, by quantile.",
+        latency_samples,
+    )
+    try:
+        source.run([killfeed, weapons])
+    finally:
+        metrics_registry.remove_gauge("live_latency_seconds")
+    return killfeed, weapons, latency
+
+
+def serve_metrics(port):
+    """Serve metrics_registry at /metrics on `port` from a daemon thread."""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics_registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("source")
+    parser.add_argument("--follow", action="store_true")
+    parser.add_argument("--realtime", action="store_true")
+    parser.add_argument(
+        "--duration", type=float, default=None, help="Stop after N seconds"
+    )
+    parser.add_argument("--metrics-port", type=int, default=None)
+    args = parser.parse_args()
+
+    def describe(latency):
+        return "latency unknown" if latency is None else f"latency {latency:.3f}s"
+
+    def on_kill(event, latency):
+        print(
+            f"[{event.timestamp:8.2f}s] {event.killer_team} {event.killer} "
+            f"-> {event.victim_team} {event.victim} ({event.weapon})"
+            f"  {describe(latency)}"
+        )
+
+    def on_weapon(weapon_name, timestamp, latency):
+        print(f"[{timestamp:8.2f}s] weapon {weapon_name}  {describe(latency)}")
+
+    if args.metrics_port is not None:
+        serve_metrics(args.metrics_port)
+
+    source = LiveFrameSource(args.source, follow=args.follow, realtime=args.realtime)
+    timer = None
+    if args.duration is not None:
+        timer = threading.Timer(args.duration, source.stop)
+        timer.start()
+
+    killfeed, weapons, latency = analyze_live(
+        source, on_kill=on_kill, on_weapon=on_weapon
+    )
+    if timer:
+        timer.cancel()
+
+    print(
+        f"\nFrames read {source.frames_read}, processed {source.frames_processed}, "
+        f"dropped {source.frames_dropped}"
+    )
+    print(f"Kills {len(killfeed.events)}")
+    print(f"Latency {latency.percentiles()}")
+
+
+if __name__ == "__main__":
+    main()
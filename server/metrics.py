@@ -0,0 +1,207 @@
+import threading
+import time
+from collections import defaultdict
+
+from config import Config
+
+# Counters every job reports, with their Prometheus help text
+COUNTERS = {
+    "frames_decoded": "Frames the decoder advanced over.",
+    "frames_sampled": "Decoded frames handed to at least one analyzer.",
+    "killfeed_frames_inferred": "Kill feed crops run through YOLO.",
+    "weapon_frames_inferred": "Weapon HUD crops run through YOLO.",
+    "rows_parsed": "Kill feed rows grouped from the detections of a crop.",
+    "events_emitted": "Kill events emitted for rows seen for the first time.",
+}
+
+
+class _Stage:
+    __slots__ = ("metrics", "name", "started")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.add_time(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class _DisabledStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_DISABLED_STAGE = _DisabledStage()
+
+
+class JobMetrics:
+    """
+    Per-job stage durations and counters.
+
+    `with metrics.stage(name):` adds the time spent in the block to the stage and
+    `count(name, n)` adds to a counter. Disabled unless Config.METRICS is set, in
+    which case both return straight away.
+    """
+
+    def __init__(self, job_id="local", enabled=Config.METRICS):
+        self.job_id = job_id
+        self.enabled = enabled
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.counters = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def stage(self, name):
+        if not self.enabled:
+            return _DISABLED_STAGE
+        return _Stage(self, name)
+
+    def add_time(self, name, seconds, calls=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.seconds[name] += seconds
+            self.calls[name] += calls
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] += n
+
+    def merge(self, other: "JobMetrics"):
+        """Add the stages and counters of `other` to these."""
+        summary = other.summary()
+        with self.lock:
+            for name, stage in summary["stages"].items():
+                self.seconds[name] += stage["seconds"]
+                self.calls[name] += stage["calls"]
+            for name, value in summary["counters"].items():
+                self.counters[name] += value
+
+    def summary(self) -> dict:
+        """Stages as {name: {"seconds", "calls"}} and the counters, for a result."""
+        with self.lock:
+            return {
+                "stages": {
+                    name: {"seconds": seconds, "calls": self.calls[name]}
+                    for name, seconds in self.seconds.items()
+                },
+                "counters": dict(self.counters),
+            }
+
+
+class MetricsRegistry:
+    """
+    Process-wide totals of the metrics of every job, in Prometheus text format.
+
+    Jobs register their JobMetrics when they start and hand them back when they
+    end; running jobs are included in `render`, so a slow job shows up while it
+    is still running. Gauges added with `add_gauge` are read at every render.
+    """
+
+    def __init__(self, prefix="valorant"):
+        self.prefix = prefix
+        self.totals = JobMetrics("total", enabled=True)
+        self.active = {}
+        self.jobs = defaultdict(int)
+        self.gauges = {}
+        self.lock = threading.Lock()
+
+    def start(self, job_id, enabled=Config.METRICS) -> JobMetrics:
+        metrics = JobMetrics(job_id, enabled)
+        with self.lock:
+            self.active[id(metrics)] = metrics
+        return metrics
+
+    def finish(self, metrics: JobMetrics, state="done"):
+        """Fold a job's metrics into the totals; `state` is done or failed."""
+        with self.lock:
+            self.active.pop(id(metrics), None)
+            self.jobs[state] += 1
+            self.totals.merge(metrics)
+
+    def add_gauge(self, name, help_text, read):
+        """Render `read()`, a list of (labels, value), as the gauge `name`."""
+        with self.lock:
+            self.gauges[name] = (help_text, read)
+
+    def remove_gauge(self, name):
+        with self.lock:
+            self.gauges.pop(name, None)
+
+    def snapshot(self) -> dict:
+        """Totals of finished and running jobs, in the shape of summary()."""
+        with self.lock:
+            combined = JobMetrics(enabled=True)
+            combined.merge(self.totals)
+            for metrics in self.active.values():
+                combined.merge(metrics)
+            jobs = dict(self.jobs)
+            jobs["running"] = len(self.active)
+
+        summary = combined.summary()
+        summary["jobs"] = jobs
+        return summary
+
+    def render(self) -> str:
+        """The snapshot in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        stages = sorted(snapshot["stages"].items())
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            name = f"{self.prefix}_{name}"
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{labels} {value}")
+
+        metric(
+            "stage_seconds_total",
+            "counter",
+            "Seconds spent in each analysis stage.",
+            [(f'{{stage="{name}"}}', stage["seconds"]) for name, stage in stages],
+        )
+        metric(
+            "stage_calls_total",
+            "counter",
+            "Times each analysis stage ran.",
+            [(f'{{stage="{name}"}}', stage["calls"]) for name, stage in stages],
+        )
+        for name in sorted({*COUNTERS, *snapshot["counters"]}):
+            help_text = COUNTERS.get(name, f"Count of {name.replace('_', ' ')}.")
+            value = snapshot["counters"].get(name, 0)
+            metric(f"{name}_total", "counter", help_text, [("", value)])
+
+        jobs = snapshot["jobs"]
+        metric(
+            "jobs_finished_total",
+            "counter",
+            "Analysis jobs that finished, by state.",
+            [(f'{{state="{s}"}}', jobs.get(s, 0)) for s in ("done", "failed")],
+        )
+        metric(
+            "jobs_running", "gauge", "Analysis jobs running.", [("", jobs["running"])]
+        )
+
+        with self.lock:
+            gauges = sorted(self.gauges.items())
+        for name, (help_text, read) in gauges:
+            metric(name, "gauge", help_text, read())
+
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry shared by every job
+metrics_registry = MetricsRegistry()
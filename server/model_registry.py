@@ -0,0 +1,82 @@
+import os
+import threading
+
+import numpy as np
+from ultralytics import YOLO
+
+
+class SharedModel:
+    """
+    A loaded YOLO model that can be handed to several jobs at once.
+
+    The ultralytics predictor keeps per-call state, so calls are serialized
+    with a lock; everything else about the model is read-only.
+    """
+
+    def __init__(self, model, path, mtime):
+        self.model = model
+        self.path = path
+        self.mtime = mtime
+        self.lock = threading.Lock()
+
+    @property
+    def names(self):
+        return self.model.names
+
+    def __call__(self, *args, **kwargs):
+        with self.lock:
+            return self.model(*args, **kwargs)
+
+
+class ModelRegistry:
+    """Load each weights file once per process and reload it when it changes on disk."""
+
+    def __init__(self):
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def get(self, path) -> SharedModel:
+        """Return the shared model for `path`, loading it if missing or stale."""
+        mtime = os.path.getmtime(path)
+
+        with self._lock:
+            model = self._models.get(path)
+            if model is None or model.mtime != mtime:
+                model = self._load(path, mtime)
+                self._models[path] = model
+
+        return model
+
+    def register(self, path, model) -> SharedModel:
+        """Serve an already loaded `model` for `path`, e.g. a stand-in in benchmarks."""
+        shared = SharedModel(model, path, os.path.getmtime(path))
+        with self._lock:
+            self._models[path] = shared
+        return shared
+
+    def preload(self, paths):
+        """Load and warm up every model in `paths`, skipping missing files."""
+        for path in paths:
+            if not os.path.exists(path):
+                print(f"Warning: Model file not found, not preloading: {path}")
+                continue
+            self.get(path)
+
+    @staticmethod
+    def _load(path, mtime):
+        print(f"Loading model: {path}")
+        model = YOLO(path)
+
+        # Run one inference so the first job does not pay for lazy setup
+        model(np.zeros((640, 640, 3), dtype=np.uint8), verbose=False)
+
+        return SharedModel(model, path, mtime)
+
+
+# Process-wide registry shared by every job
+registry = ModelRegistry()
+
+
+def get_model(path) -> SharedModel:
+    """Return the process-wide shared model for `path`."""
+    return registry.get(path)
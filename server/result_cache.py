@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import tempfile
+
+from config import Config
+
+_file_digests = {}
+
+
+def save_upload(stream, folder, extension, chunk_size=1 << 20):
+    """
+    Write an uploaded stream into `folder` named after its SHA-256.
+
+    The hash is computed while the bytes are written, so the file is never read
+    back. Returns (path, video_hash, created); `created` is False when the same
+    content had already been uploaded.
+    """
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=folder, suffix=".part")
+    with os.fdopen(fd, "wb") as f:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+            f.write(chunk)
+
+    video_hash = digest.hexdigest()
+    path = os.path.join(folder, video_hash + extension.lower())
+    created = not os.path.exists(path)
+    if created:
+        os.replace(tmp_path, path)
+    else:
+        os.remove(tmp_path)
+
+    return path, video_hash, created
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """SHA-256 of a file, memoized until its size or mtime changes."""
+    stat = os.stat(path)
+    signature = (stat.st_size, stat.st_mtime_ns)
+
+    cached = _file_digests.get(path)
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+
+    _file_digests[path] = (signature, digest.hexdigest())
+    return digest.hexdigest()
+
+
+def result_key(video_hash, **settings):
+    """
+    Cache key for an analysis of `video_hash` with the current model weights.
+
+    `settings` are the analysis parameters that change the result, such as
+    fps_target and track_timeout. The weights are part of the key, so
+    replacing a model file invalidates every result computed with the old one.
+    """
+    parts = {
+        "video": video_hash,
+        "killfeed_model": file_digest(Config.KILL_FEED_MODEL_PATH),
+        "weapon_model": file_digest(Config.WEAPON_MODEL_PATH),
+        **settings,
+    }
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    Persistent on-disk cache of analysis results, one JSON file per key.
+
+    Reads refresh a file's mtime; when the cache grows past `max_bytes`, the
+    least recently used files are deleted first.
+    """
+
+    def __init__(
+        self,
+        directory=Config.RESULT_CACHE_FOLDER,
+        max_bytes=Config.RESULT_CACHE_MAX_BYTES,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        """Return the cached result for `key`, or None."""
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                result = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        os.utime(path)  # mark as recently used
+        return result
+
+    def put(self, key, result):
+        """Store `result` under `key` and evict old entries if over budget."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(result, f)
+        os.replace(tmp_path, self._path(key))
+
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
@@ -0,0 +1,179 @@
+import subprocess
+import sys
+from typing import List
+
+import numpy as np
+
+from ffmpeg_utils import ffmpeg_binary
+from frame_source import FrameConsumer, FrameSource, VideoInfo
+from metrics import JobMetrics
+
+
+class RoiFrameSource:
+    """
+    Decode only the regions consumers look at, cropped and scaled by ffmpeg.
+
+    Every consumer must declare a `roi`. An ffmpeg process keeps one frame in
+    `every`, crops each region out of it before any colour conversion, scales it
+    and stacks the regions into one bgr24 image on its stdout. Each image is read
+    straight into a preallocated buffer and every consumer gets a view of its
+    region through `consume_roi`; nothing is copied after the pipe read.
+
+    A buffer is reused once no view of it is referenced any more, so consumers
+    may hold on to crops, as InferenceBatcher does. Frames between the kept ones
+    are never delivered, so `every` should divide the consumers' sampling
+    intervals. Timestamps are frame_index / fps.
+    """
+
+    def __init__(self, video_path, every=1, metrics=None):
+        self.video_path = video_path
+        self.every = max(1, int(every))
+        self.metrics = metrics or JobMetrics(enabled=False)
+        self.buffers = []
+        self.bytes_read = 0
+        self.frames_delivered = 0
+
+    def probe(self) -> VideoInfo:
+        return FrameSource(self.video_path).probe()
+
+    @staticmethod
+    def layout(rois):
+        """Row offset of each region in the stacked image, and the image shape."""
+        width = max(roi.output_size[0] for roi in rois)
+        offsets, height = [], 0
+        for roi in rois:
+            offsets.append(height)
+            height += roi.output_size[1]
+        return offsets, (height, width, 3)
+
+    def command(self, rois, shape):
+        _, width, _ = shape
+        select = f"select='not(mod(n\\,{self.every}))'," if self.every > 1 else ""
+        graph = [
+            f"[0:v]{select}split={len(rois)}"
+            + "".join(f"[s{i}]" for i in range(len(rois)))
+        ]
+
+        for i, roi in enumerate(rois):
+            out_width, out_height = roi.output_size
+            chain = f"[s{i}]crop={roi.width}:{roi.height}:{roi.x}:{roi.y}:exact=1"
+            if roi.size is not None:
+                chain += f",scale={out_width}:{out_height}:flags=bilinear"
+            chain += f",format=bgr24,pad={width}:{out_height}:0:0"
+            graph.append(chain + (f"[r{i}]" if len(rois) > 1 else "[out]"))
+
+        if len(rois) > 1:
+            inputs = "".join(f"[r{i}]" for i in range(len(rois)))
+            graph.append(f"{inputs}vstack=inputs={len(rois)}[out]")
+
+        return [
+            ffmpeg_binary(),
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-i",
+            self.video_path,
+            "-filter_complex",
+            ";".join(graph),
+            "-map",
+            "[out]",
+            "-fps_mode",
+            "passthrough",
+            "-f",
+            "rawvideo",
+            "-pix_fmt",
+            "bgr24",
+            "pipe:1",
+        ]
+
+    def _free_buffer(self, shape):
+        for buffer in self.buffers:
+            # Only the list, this loop and getrefcount itself refer to it
+            if sys.getrefcount(buffer) <= 3:
+                return buffer
+
+        buffer = np.empty(shape, np.uint8)
+        self.buffers.append(buffer)
+        return buffer
+
+    @staticmethod
+    def read_into(stream, buffer) -> bool:
+        """Fill `buffer` from `stream`; False at the end of the stream."""
+        view = memoryview(buffer).cast("B")
+        filled = 0
+        while filled < len(view):
+            read = stream.readinto(view[filled:])
+            if not read:
+                return False
+            filled += read
+        return True
+
+    def run(self, consumers: List[FrameConsumer], progress=None) -> VideoInfo:
+        """Decode the regions, dispatching them to interested consumers."""
+        info = self.probe()
+        if info.fps <= 0:
+            raise FileNotFoundError(f"Could not open video: {self.video_path}")
+
+        rois = [consumer.roi(info) for consumer in consumers]
+        for consumer, roi in zip(consumers, rois):
+            if roi is None:
+                raise ValueError(
+                    f"{type(consumer).__name__} needs whole frames, use FrameSource"
+                )
+
+        for consumer in consumers:
+            consumer.start(info)
+
+        offsets, shape = self.layout(rois)
+        process = subprocess.Popen(
+            self.command(rois, shape), stdout=subprocess.PIPE, bufsize=0
+        )
+
+        frame_index = 0
+        finished = False
+        try:
+            while True:
+                if progress:
+                    progress(frame_index, info.frame_count)
+
+                buffer = self._free_buffer(shape)
+                with self.metrics.stage("decode"):
+                    if not self.read_into(process.stdout, buffer):
+                        break
+                self.bytes_read += buffer.nbytes
+                self.metrics.count("frames_decoded", self.every)
+
+                timestamp = frame_index / info.fps
+                due = [
+                    (consumer, roi, offset)
+                    for consumer, roi, offset in zip(consumers, rois, offsets)
+                    if consumer.wants(frame_index)
+                ]
+                for consumer, roi, offset in due:
+                    width, height = roi.output_size
+                    crop = buffer[offset : offset + height, :width]
+                    consumer.consume_roi(crop, frame_index, timestamp)
+                if due:
+                    self.frames_delivered += 1
+                    self.metrics.count("frames_sampled")
+
+                frame_index += self.every
+            finished = True
+        finally:
+            process.stdout.close()
+            if not finished:
+                process.kill()
+            returncode = process.wait()
+
+        if returncode != 0:
+            raise RuntimeError(
+                f"ffmpeg exited with {returncode} decoding {self.video_path}"
+            )
+
+        if progress:
+            progress(info.frame_count, info.frame_count)
+
+        for consumer in consumers:
+            consumer.finish()
+
+        return info
@@ -0,0 +1,204 @@
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import List
+
+import cv2
+import torch
+
+from config import Config
+from frame_source import FrameSource, VideoInfo
+from killlfeed import KillFeedConsumer
+from model_registry import get_model
+from weapon_tracker import WeaponHudConsumer
+
+
+@dataclass
+class Segment:
+    index: int
+    start_frame: int  # first frame whose results belong to this segment
+    end_frame: int  # first frame of the next segment
+    warmup_frame: int  # decoding starts here so rows already on screen are known
+    start_time: float
+    end_time: float
+
+
+def plan_segments(
+    info: VideoInfo,
+    segment_length=Config.SEGMENT_LENGTH,
+    overlap=Config.SEGMENT_OVERLAP,
+) -> List[Segment]:
+    """Split a video into consecutive segments of `segment_length` seconds."""
+    frames_per_segment = max(1, int(segment_length * info.fps))
+    overlap_frames = math.ceil(overlap * info.fps)
+
+    segments = []
+    for start in range(0, max(info.frame_count, 1), frames_per_segment):
+        end = min(start + frames_per_segment, info.frame_count)
+        segments.append(
+            Segment(
+                index=len(segments),
+                start_frame=start,
+                end_frame=end,
+                warmup_frame=max(0, start - overlap_frames),
+                start_time=start / info.fps,
+                end_time=end / info.fps,
+            )
+        )
+
+    return segments
+
+
+def analyze_segment(
+    video_path,
+    segment: Segment,
+    kill_feed_model_path=Config.KILL_FEED_MODEL_PATH,
+    weapon_model_path=Config.WEAPON_MODEL_PATH,
+    fps_target=Config.KILL_FEED_FPS_TARGET,
+    track_timeout=Config.KILL_FEED_TRACK_TIMEOUT,
+    change_threshold=Config.KILL_FEED_CHANGE_THRESHOLD,
+):
+    """
+    Run the kill feed and weapon analyzers over one segment.
+
+    Decoding starts at the segment's warm-up frame so that rows already on screen
+    are tracked, and their events left to the previous segment. Returns the kill
+    events that belong to the segment and the raw weapon statistics.
+    """
+    killfeed = KillFeedConsumer(
+        get_model(kill_feed_model_path),
+        fps_target=fps_target,
+        track_timeout=track_timeout,
+        change_threshold=change_threshold,
+    )
+    weapons = WeaponHudConsumer(get_model(weapon_model_path))
+
+    info = FrameSource(video_path).run(
+        [killfeed, weapons],
+        start_frame=segment.warmup_frame,
+        end_frame=segment.end_frame,
+    )
+
+    # Half a frame of slack, as timestamps come from the decoder
+    owned_from = segment.start_time - 0.5 / info.fps
+    events = [event for event in killfeed.events if event.timestamp >= owned_from]
+    return events, weapons.get_statistics()
+
+
+def stitch_weapon_statistics(segments: List[Segment], statistics: List[dict]):
+    """
+    Merge per-segment WeaponTracker statistics into those of a single run.
+
+    Intervals are clipped to their segment; a weapon held across a boundary
+    becomes one interval, and the last weapon of a segment lasts until the next
+    segment sees a change.
+    """
+    runs = []  # [start, end, weapon] in time order
+    weapon_names = {}
+
+    for segment, stats in zip(segments, statistics):
+        weapon_names.update(stats["weapon_names"])
+        intervals = sorted(
+            (interval["start"], interval["end"], weapon)
+            for weapon, weapon_intervals in stats["intervals"].items()
+            for interval in weapon_intervals
+        )
+
+        clipped = []
+        for start, end, weapon in intervals:
+            start, end = max(start, segment.start_time), min(end, segment.end_time)
+            if end > start:
+                clipped.append((start, end, weapon))
+
+        if not clipped and runs:
+            runs[-1][1] = segment.end_time
+
+        for start, end, weapon in clipped:
+            if runs and runs[-1][2] == weapon:
+                runs[-1][1] = end
+            else:
+                if runs:
+                    runs[-1][1] = start
+                runs.append([start, end, weapon])
+
+    weapon_intervals = {}
+    weapon_total_time = {}
+    for start, end, weapon in runs:
+        weapon_intervals.setdefault(weapon, []).append(
+            {"start": start, "end": end, "duration": end - start}
+        )
+        weapon_total_time[weapon] = weapon_total_time.get(weapon, 0.0) + (end - start)
+
+    # Every segment has its own classification cache; report their totals
+    caches = [stats["cache"] for stats in statistics if stats.get("cache")]
+    cache = None
+    if caches:
+        hits = sum(c["hits"] for c in caches)
+        misses = sum(c["misses"] for c in caches)
+        cache = {
+            "size": caches[0]["size"],
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+        }
+
+    return {
+        "intervals": weapon_intervals,
+        "total_times": weapon_total_time,
+        "weapon_names": weapon_names,
+        "cache": cache,
+    }
+
+
+def limit_threads(threads):
+    """
+    Cap the OpenCV and torch thread pools of a worker process.
+
+    Every worker has its own decoder and models; this keeps them from
+    oversubscribing the cores shared with the other workers.
+    """
+    cv2.setNumThreads(threads)
+    torch.set_num_threads(threads)
+
+
+def analyze_video_parallel(
+    video_path,
+    workers=Config.SEGMENT_WORKERS,
+    segment_length=Config.SEGMENT_LENGTH,
+    overlap=Config.SEGMENT_OVERLAP,
+    **settings,
+):
+    """
+    Analyze a video as parallel segments in a pool of `workers` processes.
+
+    `settings` are passed on to analyze_segment. Returns (kill_events,
+    weapon_stats) as a sequential FrameSource run with fixed-rate kill feed
+    sampling would produce them.
+    """
+    info = FrameSource(video_path).probe()
+    if info.fps <= 0:
+        raise FileNotFoundError(f"Could not open video: {video_path}")
+
+    segments = plan_segments(info, segment_length, overlap)
+
+    if workers <= 1:
+        results = [analyze_segment(video_path, s, **settings) for s in segments]
+    else:
+        threads = max(1, (multiprocessing.cpu_count() or 1) // workers)
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            # Workers must not inherit the parent's torch and OpenCV thread pools
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=limit_threads,
+            initargs=(threads,),
+        ) as pool:
+            futures = [
+                pool.submit(analyze_segment, video_path, s, **settings)
+                for s in segments
+            ]
+            results = [future.result() for future in futures]
+
+    kill_events = [event for events, _ in results for event in events]
+    weapon_stats = stitch_weapon_statistics(segments, [stats for _, stats in results])
+    return kill_events, weapon_stats
@@ -1,9 +1,16 @@
-import os
+import hashlib
+import math
 import cv2
 import numpy as np
 from ultralytics import YOLO
-from collections import defaultdict
+from collections import OrderedDict, defaultdict, deque
 from config import Config
+from frame_source import FrameConsumer, Roi
+from batching import InferenceBatcher
+from checkpoint import Checkpoint
+from model_registry import get_model
+from debug_artifacts import DebugArtifacts
+from metrics import JobMetrics
 
 # Mapping of weapon class IDs to names
 weapon_dict = {
@@ -30,15 +37,8 @@ weapon_dict = {
 
 
 def load_model():
-    """Load the YOLO model for weapon detection"""
-    return YOLO(Config.WEAPON_MODEL_PATH)
-
-
-def ensure_output_directory():
-    """Ensure the output directory exists for saving frames."""
-    output_dir = "output_frames"
-    os.makedirs(output_dir, exist_ok=True)
-    return output_dir
+    """Return the shared YOLO model for weapon detection"""
+    return get_model(Config.WEAPON_MODEL_PATH)
 
 
 def extract_video_duration(video_path):
@@ -53,8 +53,8 @@ def extract_video_duration(video_path):
     return 0
 
 
-def capture_frame(video_path, timestamp, output_dir):
-    """Capture a frame from the video at a specific timestamp and save it."""
+def capture_frame(video_path, timestamp, debug=None):
+    """Capture the weapon HUD from the video at a specific timestamp."""
     cap = cv2.VideoCapture(video_path)
     fps = cap.get(cv2.CAP_PROP_FPS)
     frame_number = int(timestamp * fps)
@@ -68,6 +68,14 @@ def capture_frame(video_path, timestamp, output_dir):
         print(f"Warning: Empty frame at {timestamp:.2f}s, skipping...")
         return None
 
+    frame = crop_weapon_hud(frame, timestamp)
+    if frame is not None and debug is not None:
+        debug.save("weapon_hud", f"frame_{timestamp:.2f}.png", frame)
+    return frame
+
+
+def crop_weapon_hud(frame, timestamp):
+    """Resize a full frame to 1280x720 and crop the weapon HUD region."""
     # Resize the frame to 1280x720 (width x height)
     frame = cv2.resize(frame, (1280, 720))
 
@@ -78,10 +86,7 @@ def capture_frame(video_path, timestamp, output_dir):
         return None
 
     # Crop region of interest (adjust coordinates as needed)
-    frame = frame[458 : 458 + 178, 1070 : 1070 + 210]  # Crop region of interest
-    output_path = os.path.join(output_dir, f"frame_{timestamp:.2f}.png")
-    cv2.imwrite(output_path, frame)
-    return frame
+    return frame[458 : 458 + 178, 1070 : 1070 + 210]
 
 
 def detect_objects(model: YOLO, frame):
@@ -91,6 +96,156 @@ def detect_objects(model: YOLO, frame):
     return model(frame)
 
 
+def best_detection(results):
+    """Return (class id, confidence) of the most confident box, or (None, 0)."""
+    weapon = None
+    max_conf = 0
+
+    if results:
+        for result in results:
+            for box in result.boxes:
+                conf = float(box.conf)
+                if conf > max_conf:
+                    max_conf = conf
+                    weapon = int(box.cls)
+
+    return weapon, max_conf
+
+
+class ClassificationCache:
+    """
+    Bounded LRU of weapon HUD classifications, keyed by what the crop looks like.
+
+    The key hashes the crop downscaled to a quarter and quantised to 32 grey
+    levels per channel, so the same HUD under compression noise mostly maps to
+    the same key. At most `size` classifications are kept.
+    """
+
+    def __init__(self, size=Config.WEAPON_CACHE_SIZE):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(frame):
+        h, w = frame.shape[:2]
+        small = cv2.resize(
+            frame, (max(1, w // 4), max(1, h // 4)), interpolation=cv2.INTER_AREA
+        )
+        return hashlib.blake2b((small >> 3).tobytes(), digest_size=8).digest()
+
+    def get(self, key):
+        """Return the cached (class id, confidence) of `key`, or None."""
+        detection = self.entries.get(key)
+        if detection is None:
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return detection
+
+    def put(self, key, detection):
+        self.entries[key] = detection
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def statistics(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class WeaponClassifier:
+    """
+    Classify weapon HUD crops in batches, reusing classifications of lookalikes.
+
+    `handler(timestamp, weapon, confidence)` is called once per submitted crop,
+    in submission order. A crop whose key is cached, or is waiting in the batch
+    behind a crop with the same key, is not sent to the model. `cache_size` 0
+    sends every crop.
+    """
+
+    def __init__(
+        self,
+        model,
+        handler,
+        batch_size=Config.INFERENCE_BATCH_SIZE,
+        max_wait=Config.INFERENCE_MAX_WAIT,
+        cache_size=Config.WEAPON_CACHE_SIZE,
+        metrics=None,
+    ):
+        self.handler = handler
+        self.cache = ClassificationCache(cache_size) if cache_size > 0 else None
+        self.batcher = InferenceBatcher(
+            model, self._handle_results, batch_size, max_wait, metrics, "weapon"
+        )
+        self.queued = deque()  # (key, cached detection) of every pending crop
+        self.inflight = {}  # key: [detection, crops waiting for it]
+
+    def submit(self, frame, timestamp):
+        if self.cache is None:
+            self.queued.append((None, None))
+            self.batcher.submit(frame, timestamp)
+            return
+
+        key = self.cache.key(frame)
+        waiting = self.inflight.get(key)
+        if waiting is not None:
+            # Another crop of the batch is already being classified
+            waiting[1] += 1
+            self.cache.hits += 1
+            detection = None
+        else:
+            detection = self.cache.get(key)
+            if detection is None:
+                self.inflight[key] = [None, 1]
+
+        self.queued.append((key, detection))
+        self.batcher.submit(
+            frame, timestamp, infer=waiting is None and detection is None
+        )
+
+    def flush(self):
+        self.batcher.flush()
+
+    def _handle_results(self, _, timestamp, results):
+        key, detection = self.queued.popleft()
+
+        if key is None:
+            detection = best_detection(results)
+        elif detection is None:
+            waiting = self.inflight[key]
+            if results is not None:
+                waiting[0] = best_detection(results)
+                self.cache.put(key, waiting[0])
+            detection = waiting[0]
+            waiting[1] -= 1
+            if not waiting[1]:
+                del self.inflight[key]
+
+        self.handler(timestamp, *detection)
+
+    def statistics(self):
+        """Hit and miss counts of the cache, or None without one."""
+        return self.cache.statistics() if self.cache else None
+
+    def state(self):
+        """Classify every pending crop and return the cache, for a checkpoint."""
+        self.flush()
+        return dict(vars(self.cache)) if self.cache else None
+
+    def restore(self, state):
+        if self.cache and state:
+            self.cache.__dict__.update(state)
+
+
 class WeaponTracker:
     def __init__(self):
         self.last_weapon = None
@@ -101,17 +256,10 @@ class WeaponTracker:
 
     def update(self, timestamp, results):
         """Update weapon tracking based on YOLO results."""
-        current_weapon = None
-        max_conf = 0
-
-        if results:
-            for result in results:
-                for box in result.boxes:
-                    conf = float(box.conf)
-                    if conf > max_conf:
-                        max_conf = conf
-                        current_weapon = int(box.cls)
+        self.update_weapon(timestamp, best_detection(results)[0])
 
+    def update_weapon(self, timestamp, current_weapon):
+        """Update weapon tracking with the class id seen at `timestamp`, if any."""
         if current_weapon is not None:
             self.weapon_names[current_weapon] = weapon_dict.get(
                 current_weapon, f"Unknown-{current_weapon}"
@@ -149,11 +297,67 @@ class WeaponTracker:
         }
 
 
-def analyze_video(video_path):
-    """Analyze the entire video for weapon detection."""
+def stream_frames(video_path, timestamps, debug=None):
+    """
+    Read the video once in order and yield (timestamp, cropped frame) pairs.
+
+    Frames between samples are only grabbed, not decoded, so each sample costs one
+    decode instead of a container open plus a keyframe seek as in capture_frame.
+    """
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    frame_index = 0
+    if len(timestamps) and int(timestamps[0] * fps) > 0:
+        # Resuming part way: start at the first sample, not at the first frame
+        frame_index = int(timestamps[0] * fps)
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+
+    try:
+        for timestamp in timestamps:
+            frame_number = int(timestamp * fps)
+
+            # Skip ahead without decoding the frames in between
+            while frame_index < frame_number and cap.grab():
+                frame_index += 1
+            if frame_index < frame_number:
+                print(f"Warning: Video ended before {timestamp:.2f}s, stopping...")
+                return
+
+            ret, frame = cap.read()
+            frame_index += 1
+            if not ret or frame is None or frame.size == 0:
+                print(f"Warning: Empty frame at {timestamp:.2f}s, skipping...")
+                continue
+
+            frame = crop_weapon_hud(frame, timestamp)
+            if frame is None:
+                continue
+
+            if debug is not None:
+                debug.save("weapon_hud", f"frame_{timestamp:.2f}.png", frame)
+            yield timestamp, frame
+    finally:
+        cap.release()
+
+
+def seek_frames(video_path, timestamps, debug=None):
+    """Yield (timestamp, cropped frame) pairs by reopening and seeking per sample."""
+    for timestamp in timestamps:
+        frame = capture_frame(video_path, timestamp, debug)
+        if frame is not None:
+            yield timestamp, frame
+
+
+def analyze_video(video_path, streaming=True, debug=None, checkpoint_path=None):
+    """
+    Analyze the entire video for weapon detection.
+
+    With `streaming` the file is read once sequentially; otherwise every sample
+    reopens the file and seeks to its timestamp. With `checkpoint_path`, progress
+    is saved there periodically and a restarted run resumes from it.
+    """
     model = load_model()
     tracker = WeaponTracker()
-    output_dir = ensure_output_directory()
 
     total_duration = extract_video_duration(video_path)
     if total_duration == 0:
@@ -165,20 +369,162 @@ def analyze_video(video_path):
     )
 
     timestamps = np.arange(0, total_duration, 1.0)  # Process at 1-second intervals
+    frames = stream_frames if streaming else seek_frames
+    classifier = WeaponClassifier(
+        model, lambda t, weapon, _: tracker.update_weapon(t, weapon)
+    )
 
-    for timestamp in timestamps:
-        frame = capture_frame(video_path, timestamp, output_dir)
-        if frame is None:
-            continue  # Skip processing if the frame is invalid
-
-        results = detect_objects(model, frame)
-        if results:
-            tracker.update(timestamp, results)
+    checkpoint = None
+    if checkpoint_path:
+        checkpoint = Checkpoint(checkpoint_path, video_path, {"step": 1.0})
+        resume = checkpoint.load()
+        if resume is not None:
+            # Carry on with the first sample the checkpoint had not reached
+            next_timestamp, state = resume
+            tracker.__dict__.update(state["tracker"])
+            classifier.restore(state["cache"])
+            timestamps = timestamps[timestamps >= next_timestamp]
+
+    for timestamp, frame in frames(video_path, timestamps, debug):
+        if checkpoint and checkpoint.due():
+            state = {"cache": classifier.state(), "tracker": dict(vars(tracker))}
+            checkpoint.save(timestamp, state)
+        if frame.size:
+            classifier.submit(frame, timestamp)
+    classifier.flush()
 
     if tracker.last_weapon is not None:
         tracker._end_current_interval(total_duration)
+    if checkpoint:
+        checkpoint.clear()
+
+    stats = tracker.get_statistics()
+    stats["cache"] = classifier.statistics()
+    return stats
+
+
+class WeaponHudConsumer(FrameConsumer):
+    """
+    Sample the weapon HUD once every `step` seconds and track weapon intervals.
+
+    If the frame of a sample is never delivered, as when a live source drops
+    frames, the next delivered frame is used in its place.
+    """
+
+    def __init__(
+        self,
+        model,
+        step=1.0,
+        debug=None,
+        batch_size=Config.INFERENCE_BATCH_SIZE,
+        max_wait=Config.INFERENCE_MAX_WAIT,
+        metrics=None,
+        cache_size=Config.WEAPON_CACHE_SIZE,
+    ):
+        self.step = step
+        self.debug = debug or DebugArtifacts(enabled=False)
+        self.metrics = metrics or JobMetrics(enabled=False)
+        self.tracker = WeaponTracker()
+        self.classifier = WeaponClassifier(
+            model,
+            self._handle_detection,
+            batch_size,
+            max_wait,
+            cache_size,
+            metrics=self.metrics,
+        )
+        self.listeners = []
+
+    def add_listener(self, callback):
+        """Register `callback(weapon_name, timestamp)` for every weapon change."""
+        self.listeners.append(callback)
+
+    def _handle_detection(self, timestamp, detected, _):
+        last_weapon = self.tracker.last_weapon
+        self.tracker.update_weapon(timestamp, detected)
+
+        weapon = self.tracker.last_weapon
+        if weapon != last_weapon:
+            for callback in self.listeners:
+                callback(self.tracker.weapon_names[weapon], timestamp)
+
+    def start(self, info):
+        super().start(info)
+        self.sample_index = 0
+        self.next_frame = 0
+
+    def seek(self, frame_index):
+        # First sample whose frame is at or after frame_index
+        frames_per_sample = self.step * self.info.fps
+        self.sample_index = max(0, math.ceil(frame_index / frames_per_sample) - 1)
+        self.next_frame = int(self.sample_index * self.step * self.info.fps)
+        while self.next_frame < frame_index:
+            self._advance()
+
+    def _advance(self):
+        self.sample_index += 1
+        self.next_frame = int(self.sample_index * self.step * self.info.fps)
+
+    def wants(self, frame_index):
+        return frame_index >= self.next_frame
+
+    def next_wanted(self, frame_index):
+        return max(frame_index, self.next_frame)
+
+    def roi(self, info):
+        # The region crop_weapon_hud takes after resizing the frame to 1280x720
+        sx, sy = info.width / 1280, info.height / 720
+        return Roi(
+            x=round(1070 * sx),
+            y=round(458 * sy),
+            width=round(210 * sx),
+            height=round(178 * sy),
+            size=(210, 178),
+        )
+
+    def consume(self, frame, frame_index, timestamp):
+        with self.metrics.stage("weapon_crop"):
+            frame = crop_weapon_hud(frame, timestamp)
+        self.consume_roi(frame, frame_index, timestamp)
+
+    def consume_roi(self, frame, frame_index, timestamp):
+        # Report the nominal sample time, as analyze_video does
+        timestamp = self.sample_index * self.step
+        while self.next_frame <= frame_index:
+            self._advance()
+
+        if frame is None:
+            return
 
-    return tracker.get_statistics()
+        self.debug.save("weapon_hud", f"frame_{timestamp:.2f}.png", frame)
+
+        if frame.size:
+            self.classifier.submit(frame, timestamp)
+
+    def finish(self):
+        self.classifier.flush()
+        if self.tracker.last_weapon is not None:
+            self.tracker._end_current_interval(self.info.duration)
+
+    def state(self):
+        return {
+            "cache": self.classifier.state(),
+            "tracker": dict(vars(self.tracker)),
+            "sample_index": self.sample_index,
+            "next_frame": self.next_frame,
+        }
+
+    def restore(self, state):
+        # Listeners only hear of the weapon changes after the resume
+        self.classifier.restore(state["cache"])
+        self.tracker.__dict__.update(state["tracker"])
+        self.sample_index = state["sample_index"]
+        self.next_frame = state["next_frame"]
+
+    def get_statistics(self):
+        stats = self.tracker.get_statistics()
+        stats["cache"] = self.classifier.statistics()
+        return stats
 
 
 dicti = {}